@@ -1,11 +1,46 @@
-import re
-import json
 import os
-import glob
-import phonenumbers
-import pyap
-from typing import Set, Dict, Optional
-from config import SERP_PREVIOUS_SEARCHES_PATH
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from itertools import islice
+from typing import Set, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from address_extractor import ParsedAddress, iter_addresses, parse_addresses
+from extraction_profiles import (
+    DEFAULT_COUNTRY_CODE,
+    ExtractionProfile,
+    get_extraction_profile,
+    get_profile_for_debtor,
+)
+from phone_extractor import find_phone_numbers, iter_phone_spans
+from serp_store import get_serp_store
+
+
+# Step 1: Use a broad, simple regex to find all potential email candidates.
+_EMAIL_CANDIDATE = re.compile(r"[\w.\-+'_]+@[\w.\-]+\.\w+")
+
+# Step 2: Use a strict, comprehensive regex to validate each candidate.
+# This regex is intended for use on isolated strings (hence the ^ and $).
+_EMAIL_VALIDATOR = re.compile(
+    r"^(?P<local>[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*)"
+    r"@"
+    r"(?P<domain>(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)$",
+    re.IGNORECASE
+)
+
+# Bump whenever a change to the extractors can change their results, so
+# cached extraction results are recomputed
+EXTRACTOR_VERSION = '4'
+
+# Matches longer than this may be lost or truncated at a chunk boundary
+DEFAULT_STREAM_OVERLAP = 1024
+DEFAULT_STREAM_WINDOW_SIZE = 65536
+
+
+def iter_email_spans(text: str) -> Iterator[Tuple[int, int, str]]:
+    """Yields (start, end, email) for the valid email addresses of text, lowercased."""
+    for candidate in _EMAIL_CANDIDATE.finditer(text):
+        match = _EMAIL_VALIDATOR.fullmatch(candidate.group(0))
+        if match:
+            yield candidate.start(), candidate.end(), match.group(0).lower()
 
 
 class ContactExtractor:
@@ -17,31 +52,28 @@ class ContactExtractor:
     subsequent calls.
     """
 
-    def __init__(self, text: str):
+    def __init__(self, text: str, profile: Optional[ExtractionProfile] = None):
         """
         Initializes the Extractor with the text to be analyzed.
 
         Args:
             text: The source string to extract information from.
+            profile: The country profile (phone region, address grammar).
+                Defaults to the Canadian profile.
         """
         self.text = text
+        self.profile = profile or get_extraction_profile()
         self._phones: Optional[Set[str]] = None
         self._emails: Optional[Set[str]] = None
         self._addresses: Optional[Set[str]] = None
+        self._address_components: Optional[List[ParsedAddress]] = None
 
     def extract_phone_numbers(self) -> Set[str]:
         """Finds all valid North American phone numbers."""
         if self._phones is not None:
             return self._phones
 
-        found_numbers = set()
-        for match in phonenumbers.PhoneNumberMatcher(self.text, "CA"):
-            if phonenumbers.is_valid_number(match.number) and match.number.country_code == 1:
-                formatted_number = phonenumbers.format_number(
-                    match.number,
-                    phonenumbers.PhoneNumberFormat.NATIONAL
-                )
-                found_numbers.add(formatted_number)
+        found_numbers = find_phone_numbers(self.text, self.profile.phone_region)
 
         self._phones = found_numbers
         return self._phones
@@ -53,36 +85,26 @@ class ContactExtractor:
         if self._emails is not None:
             return self._emails
 
-        # Step 1: Use a broad, simple regex to find all potential email candidates.
-        basic_email_finder = re.compile(r"[\w.\-+'_]+@[\w.\-]+\.\w+")
-
-        # Step 2: Use a strict, comprehensive regex to validate each candidate.
-        # This regex is intended for use on isolated strings (hence the ^ and $).
-        validation_email_regex = re.compile(
-            r"^(?P<local>[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*)"
-            r"@"
-            r"(?P<domain>(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?)$",
-            re.IGNORECASE
-        )
-
-        potential_emails = basic_email_finder.findall(self.text)
-
-        validated_emails = set()
-        for email_candidate in potential_emails:
-            match = validation_email_regex.fullmatch(email_candidate)
-            if match:
-                validated_emails.add(match.group(0).lower())
+        validated_emails = {email for _, _, email in iter_email_spans(self.text)}
 
         self._emails = validated_emails
         return self._emails
 
+    def extract_address_components(self) -> List[ParsedAddress]:
+        """Finds all Canadian or US addresses, with their civic number, street, city, province and postal code."""
+        if self._address_components is not None:
+            return self._address_components
+
+        self._address_components = parse_addresses(self.text, self.profile.country_code)
+        return self._address_components
+
     def extract_addresses(self) -> Set[str]:
         """Finds all Canadian or US addresses."""
         if self._addresses is not None:
             return self._addresses
 
         found_addresses = set()
-        for address in pyap.parse(self.text, country='CA'):
+        for address in self.extract_address_components():
             found_addresses.add(address.full_address)
 
         self._addresses = found_addresses
@@ -102,35 +124,201 @@ class ContactExtractor:
         }
 
 
-# --- The load_searches function remains the same ---
+class StreamingContactExtractor:
+    """
+    Extracts phone numbers, emails and addresses from a text received in
+    chunks (crawl4ai streaming results, a file read in blocks, ...), without
+    ever holding the whole text.
+
+    Chunks are buffered until window_size characters are pending, then the
+    buffer is scanned. A match is accepted only once at least `overlap`
+    characters follow it, so a match crossing a chunk boundary is seen whole
+    in the next scan; the last `overlap` characters are kept as the context
+    of the next scan. Peak memory is about window_size + overlap characters.
+    """
+
+    def __init__(self, overlap: int = DEFAULT_STREAM_OVERLAP, window_size: int = DEFAULT_STREAM_WINDOW_SIZE,
+                 profile: Optional[ExtractionProfile] = None):
+        """
+        Args:
+            overlap: Characters kept between scans; must exceed the longest match.
+            window_size: Characters buffered before a scan.
+            profile: The country profile. Defaults to the Canadian profile.
+        """
+        self.profile = profile or get_extraction_profile()
+        self.overlap = overlap
+        self.window_size = window_size
+        self._buffer = ''
+        # Chunks received since the last scan, joined into the buffer at the next scan
+        self._pending: List[str] = []
+        self._pending_size = 0
+        # Absolute position of the buffer start, and end of the accepted region
+        self._buffer_start = 0
+        self._committed = 0
+        self._results: Dict[str, Set[str]] = {"phones": set(), "emails": set(), "addresses": set()}
+
+    def _iter_matches(self, text: str) -> Iterator[Tuple[str, int, int, str]]:
+        for start, end, number in iter_phone_spans(text, self.profile.phone_region):
+            yield "phones", start, end, number
+        for start, end, email in iter_email_spans(text):
+            yield "emails", start, end, email
+        for address in iter_addresses(text, self.profile.country_code):
+            yield "addresses", address.start, address.end, address.full_address
+
+    def _scan(self, final: bool) -> List[Tuple[str, str]]:
+        self._buffer = ''.join([self._buffer] + self._pending)
+        self._pending, self._pending_size = [], 0
+        buffer_end = self._buffer_start + len(self._buffer)
+        limit = buffer_end if final else buffer_end - self.overlap
+        if limit <= self._committed:
+            return []
+
+        new_findings = []
+        for kind, start, end, value in self._iter_matches(self._buffer):
+            end += self._buffer_start
+            # Matches ending before the committed position were accepted by an earlier scan
+            if end <= self._committed or end > limit:
+                continue
+            if value not in self._results[kind]:
+                self._results[kind].add(value)
+                new_findings.append((kind, value))
+
+        self._committed = limit
+        keep_from = max(self._buffer_start, limit - self.overlap)
+        self._buffer = self._buffer[keep_from - self._buffer_start:]
+        self._buffer_start = keep_from
+        return new_findings
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Adds a chunk of text.
+
+        Returns:
+            The (kind, value) findings not seen before, where kind is 'phones',
+            'emails' or 'addresses'; empty until enough text is buffered.
+        """
+        new_findings = []
+        for offset in range(0, len(chunk), self.window_size):
+            piece = chunk[offset:offset + self.window_size]
+            self._pending.append(piece)
+            self._pending_size += len(piece)
+            unscanned = self._buffer_start + len(self._buffer) + self._pending_size - self._committed
+            if unscanned >= self.window_size + self.overlap:
+                new_findings.extend(self._scan(final=False))
+        return new_findings
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Scans the rest of the buffer and returns the last new findings."""
+        new_findings = self._scan(final=True)
+        self._buffer = ''
+        self._buffer_start = self._committed
+        return new_findings
+
+    def results(self) -> Dict[str, Set[str]]:
+        """Returns every finding so far, with the same keys as `ContactExtractor.extract_all`."""
+        return {kind: set(values) for kind, values in self._results.items()}
+
+
+def extract_stream(chunks: Iterable[str], overlap: int = DEFAULT_STREAM_OVERLAP,
+                   window_size: int = DEFAULT_STREAM_WINDOW_SIZE,
+                   profile: Optional[ExtractionProfile] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Extracts contact information from a stream of text chunks.
+
+    Yields:
+        (kind, value) pairs, each value once, as soon as they are found.
+    """
+    extractor = StreamingContactExtractor(overlap, window_size, profile)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
+
+
+def _extract_chunk(chunk: List[Tuple[Hashable, str, str]]) -> List[Tuple[Hashable, Dict[str, Set[str]]]]:
+    """Runs the extraction of a chunk of (key, text, country code) in a worker process."""
+    return [
+        (key, ContactExtractor(text, get_extraction_profile(country_code)).extract_all())
+        for key, text, country_code in chunk
+    ]
+
+
+def _iter_chunks(items: Iterable[Tuple], chunk_size: int) -> Iterator[List[Tuple]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def extract_batch(items: Iterable[Tuple[Hashable, str]], max_workers: Optional[int] = None,
+                  chunk_size: int = 32,
+                  country_code: str = DEFAULT_COUNTRY_CODE) -> Iterator[Tuple[Hashable, Dict[str, Set[str]]]]:
+    """
+    Extracts contact information from many texts on a pool of worker processes.
+
+    Texts are sent to the workers in chunks of chunk_size, and only a few
+    chunks per worker are in flight at once, so the input can be a lazy
+    iterator over a large corpus.
+
+    Args:
+        items: (key, text) pairs; the key identifies the text in the results.
+        max_workers: Number of worker processes. Defaults to the number of CPUs.
+            With 1, the extraction runs in the current process.
+        chunk_size: Number of texts sent to a worker at once.
+        country_code: Selects the extraction profile of every text.
+
+    Yields:
+        (key, result) pairs as they complete, where result has the same shape
+        as `ContactExtractor.extract_all`.
+    """
+    return _extract_batch(((key, text, country_code) for key, text in items), max_workers, chunk_size)
+
+
+def extract_batch_for_debtors(items: Iterable[Tuple[int, str]], max_workers: Optional[int] = None,
+                              chunk_size: int = 32) -> Iterator[Tuple[int, Dict[str, Set[str]]]]:
+    """
+    Same as extract_batch for (debtor_id, text) pairs, each text being
+    extracted with the profile selected by the CountryID of its debtor.
+    """
+    return _extract_batch(
+        ((debtor_id, text, get_profile_for_debtor(debtor_id).country_code) for debtor_id, text in items),
+        max_workers, chunk_size
+    )
+
+
+def _extract_batch(items: Iterable[Tuple[Hashable, str, str]], max_workers: Optional[int],
+                   chunk_size: int) -> Iterator[Tuple[Hashable, Dict[str, Set[str]]]]:
+    max_workers = max_workers or os.cpu_count() or 1
+    chunks = _iter_chunks(items, chunk_size)
+
+    if max_workers == 1:
+        for chunk in chunks:
+            yield from _extract_chunk(chunk)
+        return
+
+    max_pending = max_workers * 2
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(_extract_chunk, chunk))
+            if len(pending) < max_pending:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+        for future in as_completed(pending):
+            yield from future.result()
+
+
 def load_searches() -> Dict[str, Dict[int, Dict[str, str]]]:
-    """Load text from serp api json file"""
-    json_files = glob.glob(os.path.join(SERP_PREVIOUS_SEARCHES_PATH, '*.json'))
+    """Load the titles and snippets of the organic results from the SERP store, importing the JSON archive if empty"""
+    serp_store = get_serp_store()
+    serp_store.import_json_directory_if_empty()
     searches = {}
-    for file in json_files:
-        file_name = os.path.basename(file).split('.')[0]
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                processed_results = {}
-                data = json.load(f)
-                organic_results = data.get('organic_results', [])
-
-                for organic_item in organic_results:
-                    title = organic_item.get('title', '')
-                    snippet = organic_item.get('snippet', '')
-                    position = organic_item.get('position')
-
-                    if position:
-                        processed_results[position] = {
-                            'title': title,
-                            'snippet': snippet,
-                        }
-
-                if processed_results:
-                    searches[file_name] = processed_results
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Warning: Could not load or parse file {file_name}. Error: {e}")
-            continue
+    for debtor_id, position, title, snippet in serp_store.iter_organic_results(('title', 'snippet')):
+        searches.setdefault(str(debtor_id), {})[position] = {
+            'title': title or '',
+            'snippet': snippet or '',
+        }
     return searches
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+import re
+import pyap
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from name_matching import fold
+
+# Characters of text read before a postal code or ZIP to find the street
+WINDOW_BEFORE = 160
+
+PROVINCE_CODES = {
+    'QC': ('quebec', 'qc', 'que', 'pq'),
+    'ON': ('ontario', 'ont', 'on'),
+    'BC': ('british columbia', 'colombie-britannique', 'bc', 'cb'),
+    'AB': ('alberta', 'alta', 'ab'),
+    'MB': ('manitoba', 'man', 'mb'),
+    'SK': ('saskatchewan', 'sask', 'sk'),
+    'NS': ('nova scotia', 'nouvelle-ecosse', 'ns', 'ne'),
+    'NB': ('new brunswick', 'nouveau-brunswick', 'nb'),
+    'NL': ('newfoundland and labrador', 'terre-neuve-et-labrador', 'newfoundland', 'terre-neuve', 'nl', 'tnl'),
+    'PE': ('prince edward island', 'ile-du-prince-edouard', 'pei', 'pe', 'ipe'),
+    'YT': ('yukon', 'yt'),
+    'NT': ('northwest territories', 'territoires du nord-ouest', 'nt', 'tno'),
+    'NU': ('nunavut', 'nu'),
+}
+_PROVINCE_BY_NAME = {name: code for code, names in PROVINCE_CODES.items() for name in names}
+
+US_STATE_CODES = (
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS',
+    'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC',
+    'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+)
+
+# Street types written before the name ('rue Fanny', 'boul. des Laurentides')
+FRENCH_STREET_TYPES = (
+    'rue', 'avenue', 'av', 'ave', 'boulevard', 'boul', 'bd', 'blvd', 'chemin', 'ch', 'route', 'rte',
+    'rang', 'montée', 'montee', 'côte', 'cote', 'place', 'pl', 'promenade', 'croissant', 'impasse',
+    'allée', 'allee', 'terrasse', 'carré', 'carre', 'square', 'autoroute', 'ruelle', 'quai', 'rond-point',
+)
+# Street types written after the name ('Main St', 'Amphitheatre Parkway')
+ENGLISH_STREET_TYPES = (
+    'street', 'st', 'avenue', 'ave', 'av', 'road', 'rd', 'boulevard', 'blvd', 'drive', 'dr', 'lane', 'ln',
+    'way', 'court', 'ct', 'crescent', 'cres', 'place', 'pl', 'highway', 'hwy', 'parkway', 'pkwy',
+    'terrace', 'circle', 'cir', 'trail', 'trl', 'square', 'sq', 'row', 'gate', 'grove', 'heights', 'line',
+)
+# French types as written by English directories in Canada ('8245 Fanny Rue')
+CANADIAN_ENGLISH_STREET_TYPES = ENGLISH_STREET_TYPES + ('rue', 'chemin')
+DIRECTIONS = ('north', 'south', 'east', 'west', 'nord', 'sud', 'est', 'ouest', 'n', 's', 'e', 'w', 'o')
+
+
+def _alternation(words) -> str:
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+_CA_POSTAL_CODE = r'[ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z][ -]?\d[ABCEGHJ-NPRSTV-Z]\d'
+# A province written after a comma or in parentheses also ends an address
+# ('Petit-Cap, NB', 'Laval (Québec)'), unless a postal code, ZIP code or
+# another province follows: 'Québec' is then the city ('Québec (Québec) G1V 2L1')
+_PROVINCE_ANCHOR = (
+    r'QC|ON|BC|AB|MB|SK|NS|NB|NL|PE|YT|NT|NU|Qu[eé]bec|Ontario|British Columbia|Colombie-Britannique'
+    r'|Alberta|Manitoba|Saskatchewan|Nova Scotia|Nouvelle-[EÉ]cosse|New Brunswick|Nouveau-Brunswick'
+)
+_ANCHOR_PATTERNS = {
+    'postal_code': rf'(?P<postal_code>{_CA_POSTAL_CODE})',
+    'zip_code': rf'(?P<state>{"|".join(US_STATE_CODES)})\.?,?[ \t]+(?P<zip_code>\d{{5}}(?:-\d{{4}})?)',
+    'province_only': (
+        rf'(?:(?<=[,(] )|(?<=\())(?P<province_only>{_PROVINCE_ANCHOR})\)?'
+        rf'(?![\s,.()]*(?:{_CA_POSTAL_CODE}|\d{{5}}|(?:{_PROVINCE_ANCHOR})(?![\w-])))'
+    ),
+}
+
+_PROVINCE_NAME = (
+    r"qu[eé]bec|ontario|british columbia|colombie-britannique|alberta|manitoba|saskatchewan"
+    r"|nova scotia|nouvelle-[eé]cosse|new brunswick|nouveau-brunswick"
+    r"|newfoundland(?: and labrador)?|terre-neuve(?:-et-labrador)?"
+    r"|prince edward island|[iî]le-du-prince-[eé]douard|yukon|northwest territories"
+    r"|territoires du nord-ouest|nunavut|que|ont|alta|man|sask|pei|tno|tnl|ipe"
+    r"|qc|pq|on|bc|cb|ab|mb|sk|ns|ne|nb|nl|pe|yt|nt|nu"
+)
+# Province at the end of the text before a postal code: 'Laval (Québec) ', 'Toronto, ON '
+_TRAILING_PROVINCE = re.compile(
+    rf'(?:\(\s*(?P<paren>{_PROVINCE_NAME})\.?\s*\)|(?<![\w-])(?P<plain>{_PROVINCE_NAME})\.?)[\s,]*$',
+    re.IGNORECASE
+)
+
+_CIVIC_NUMBER = r'(?P<civic>\d{1,6}(?:-?[A-Za-z](?![\w-])|-\d{1,6})?)'
+_DIRECTION = rf'(?:[ \t]+(?:{_alternation(DIRECTIONS)})\.?(?![\w-]))?'
+_CIVIC_START = re.compile(r'(?<![\w.,-])\d{1,6}(?![\d])')
+_UNIT = re.compile(
+    r'^(?:suite|ste|bureau|unit|unité|local|app|apt|appartement|porte|#)\.?\s*#?\s*[\w-]+$',
+    re.IGNORECASE
+)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ParsedAddress(NamedTuple):
+    """An address found in a text, with its components."""
+    full_address: str
+    civic_number: Optional[str]
+    street: Optional[str]
+    unit: Optional[str]
+    city: Optional[str]
+    province: Optional[str]
+    postal_code: Optional[str]
+    start: int
+    end: int
+    source: str = 'anchor'
+
+
+class AddressGrammar:
+    """
+    The compiled anchors and street grammars used to find the addresses of
+    one country. Canadian text has postal code, province and ZIP anchors and
+    both the French and English street grammars; US text has ZIP anchors and
+    the English grammar only.
+    """
+
+    def __init__(self, country_code: str):
+        self.country_code = country_code
+        if country_code == 'US':
+            anchor_kinds = ('zip_code',)
+            english_street_types = ENGLISH_STREET_TYPES
+            french_street_types = ()
+        else:
+            anchor_kinds = ('postal_code', 'zip_code', 'province_only')
+            english_street_types = CANADIAN_ENGLISH_STREET_TYPES
+            french_street_types = FRENCH_STREET_TYPES
+
+        alternatives = '|'.join(_ANCHOR_PATTERNS[kind] for kind in anchor_kinds)
+        self.anchor = re.compile(rf'(?<![\w-])(?:{alternatives})(?![\w-])')
+        self.english_street = re.compile(
+            rf"{_CIVIC_NUMBER}[ \t]+(?P<name>(?:[\w'’.-]+[ \t]+){{1,4}}?)"
+            rf'(?P<type>{_alternation(english_street_types)})\.?(?![\w-]){_DIRECTION}',
+            re.IGNORECASE
+        )
+        self.french_street = None
+        if french_street_types:
+            self.french_street = re.compile(
+                rf'{_CIVIC_NUMBER},?[ \t]+(?P<type>{_alternation(french_street_types)})\.?[ \t]+(?=\w)',
+                re.IGNORECASE
+            )
+
+    def find_street(self, prefix: str) -> Optional[Tuple[re.Match, bool]]:
+        """Returns the street match closest to the end of prefix, and whether it is a French one."""
+        for civic in reversed(list(_CIVIC_START.finditer(prefix))):
+            if self.french_street is not None:
+                match = self.french_street.match(prefix, civic.start())
+                if match:
+                    return match, True
+            match = self.english_street.match(prefix, civic.start())
+            if match:
+                return match, False
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_address_grammar(country_code: str = 'CA') -> AddressGrammar:
+    """Returns the compiled address grammar of a country ('CA' or 'US'), built once per process."""
+    return AddressGrammar(country_code)
+
+
+def _clean(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip(' ,;:-–')
+
+
+def normalize_province(name: str) -> Optional[str]:
+    """Returns the two-letter code of a Canadian province name or abbreviation: 'Québec' -> 'QC'."""
+    return _PROVINCE_BY_NAME.get(fold(name).strip(' .'))
+
+
+def _split_locality(rest: str, french: bool) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Splits the text between the street type and the province into
+    (street name remainder, unit, city).
+
+    After a French street type, the name runs until the city; without a comma
+    between them, the last word is taken as the city ('rue Fanny Laval').
+    """
+    parts = [_clean(part) for part in rest.split(',')]
+    parts = [part for part in parts if part]
+    name = parts.pop(0) if french and parts else ''
+    unit = None
+    remaining = []
+    for part in parts:
+        if unit is None and _UNIT.match(part):
+            unit = part
+        else:
+            remaining.append(part)
+    if not remaining and french and ' ' in name:
+        name, city = name.rsplit(' ', 1)
+        return name, unit, city
+    if remaining and not french:
+        # 'Suite 4 Toronto'
+        words = remaining[0].split(' ')
+        if len(words) > 2 and _UNIT.match(' '.join(words[:2])):
+            unit = unit or ' '.join(words[:2])
+            remaining[0] = ' '.join(words[2:])
+    return name, unit, remaining[-1] if remaining else None
+
+
+def _parse_at_anchor(grammar: AddressGrammar, text: str, anchor: re.Match,
+                     window_start: int) -> Optional[ParsedAddress]:
+    groups = anchor.groupdict()
+    if groups.get('postal_code'):
+        postal_code = groups['postal_code'].upper().replace('-', ' ')
+        if ' ' not in postal_code:
+            postal_code = f'{postal_code[:3]} {postal_code[3:]}'
+        prefix = text[window_start:anchor.start()]
+        province_match = _TRAILING_PROVINCE.search(prefix)
+        province = None
+        if province_match:
+            province = normalize_province(province_match.group('paren') or province_match.group('plain'))
+            prefix = prefix[:province_match.start()]
+    elif groups.get('province_only'):
+        postal_code = None
+        province = normalize_province(groups['province_only'])
+        prefix = text[window_start:anchor.start()].rstrip(' (')
+    else:
+        postal_code = groups['zip_code']
+        province = groups['state']
+        prefix = text[window_start:anchor.start('state')]
+
+    found = grammar.find_street(prefix)
+    if found is None:
+        return None
+    street_match, french = found
+    rest = prefix[street_match.end():]
+    name, unit, city = _split_locality(rest, french)
+    if french:
+        if not name:
+            return None
+        street = _clean(street_match.group(0)[street_match.start('type') - street_match.start():] + name)
+    else:
+        street = _clean(street_match.group(0)[len(street_match.group('civic')):])
+
+    start = window_start + street_match.start()
+    return ParsedAddress(
+        full_address=_clean(text[start:anchor.end()]),
+        civic_number=street_match.group('civic'),
+        street=street,
+        unit=unit,
+        city=city,
+        province=province,
+        postal_code=postal_code,
+        start=start,
+        end=anchor.end(),
+    )
+
+
+def _parse_with_pyap(text: str, anchor: re.Match, window_start: int) -> List[ParsedAddress]:
+    """Fallback for an anchor the street grammar could not resolve, on its window only."""
+    country = 'US' if anchor.groupdict().get('zip_code') else 'CA'
+    window = text[window_start:anchor.end()]
+    parsed = []
+    for address in pyap.parse(window, country=country):
+        province = address.region1
+        if country == 'CA' and province:
+            province = normalize_province(province) or province
+        parsed.append(ParsedAddress(
+            full_address=address.full_address,
+            civic_number=address.street_number,
+            street=' '.join(filter(None, (address.street_name, address.street_type))) or address.full_street,
+            unit=address.occupancy,
+            city=address.city,
+            province=province,
+            postal_code=address.postal_code,
+            start=window_start + address.match_start,
+            end=window_start + address.match_end,
+            source='pyap',
+        ))
+    return parsed
+
+
+def iter_addresses(text: str, country_code: str = 'CA') -> Iterator[ParsedAddress]:
+    """
+    Yields the addresses of text, with the address grammar of a country.
+
+    Every Canadian postal code, US state + ZIP code, and province written
+    after a comma or in parentheses is an anchor (only ZIP codes for 'US');
+    only the WINDOW_BEFORE characters before it, back to the previous postal
+    or ZIP code, are parsed with the street grammars of the country. Anchors
+    they cannot resolve are handed to pyap, restricted to the same window.
+    """
+    grammar = get_address_grammar(country_code)
+    previous_end = 0
+    yielded_end = 0
+    for anchor in grammar.anchor.finditer(text):
+        window_start = max(previous_end, anchor.start() - WINDOW_BEFORE)
+        # A province alone is a weak anchor and does not clip the window of the next one
+        if not anchor.groupdict().get('province_only'):
+            previous_end = anchor.end()
+        address = _parse_at_anchor(grammar, text, anchor, window_start)
+        addresses = [address] if address is not None else _parse_with_pyap(text, anchor, window_start)
+        for address in addresses:
+            # An address already ended by a province anchor is not found again
+            if address.start >= yielded_end:
+                yielded_end = address.end
+                yield address
+
+
+def parse_addresses(text: str, country_code: str = 'CA') -> List[ParsedAddress]:
+    """Returns the addresses of text with their components, in order of appearance."""
+    return list(iter_addresses(text, country_code))
+
+
+def find_addresses(text: str, country_code: str = 'CA') -> Set[str]:
+    """Returns the full addresses found in text."""
+    return {address.full_address for address in iter_addresses(text, country_code)}
@@ -11,9 +11,57 @@ PROJECT_ROOT = __cur_dir__.parent
 
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 
+# Batch search settings, to be matched to the SerpApi plan
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+SERPAPI_RATE_PER_SECOND = float(os.getenv("SERPAPI_RATE_PER_SECOND", "1.0"))
+SERPAPI_BURST = int(os.getenv("SERPAPI_BURST", "5"))
+SERPAPI_MAX_CONCURRENCY = int(os.getenv("SERPAPI_MAX_CONCURRENCY", "10"))
+SERPAPI_MAX_RETRIES = int(os.getenv("SERPAPI_MAX_RETRIES", "3"))
+
 DEBTOR_CSV_PATH = os.path.join(PROJECT_ROOT, 'data/Debtors.csv')
+ENRICHMENT_DB_PATH = os.path.join(PROJECT_ROOT, 'data/enrichment.sqlite')
 SERP_PREVIOUS_SEARCHES_PATH = os.path.join(PROJECT_ROOT, 'data/serp_previous_searches')
 
+# Consolidated store of raw SerpApi responses and their organic results
+SERP_STORE_DB_PATH = os.path.join(PROJECT_ROOT, 'data/serp_searches.sqlite')
+# Also write each response as its own JSON file in SERP_PREVIOUS_SEARCHES_PATH
+SERP_SAVE_JSON_FILES = os.getenv("SERP_SAVE_JSON_FILES", "0") == "1"
+
+# Content-addressed SERP cache, shared by debtors with identical search parameters
+SERP_CACHE_DB_PATH = os.path.join(PROJECT_ROOT, 'data/serp_cache.sqlite')
+SERP_CACHE_TTL_DAYS = float(os.getenv("SERP_CACHE_TTL_DAYS", "90"))
+SERP_CACHE_MAX_ENTRIES = int(os.getenv("SERP_CACHE_MAX_ENTRIES", "500000"))
+SERP_CACHE_MAX_BYTES = int(os.getenv("SERP_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+
+# Cache of contact extraction results, in its own database
+EXTRACTION_CACHE_DB_PATH = os.path.join(PROJECT_ROOT, 'data/extraction_cache.sqlite')
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# Crawl4AI service, to be matched to the browser pool of the container
+CRAWL4AI_BASE_URL = os.getenv("CRAWL4AI_TEST_URL", "http://localhost:11235")
+CRAWL4AI_MAX_CONCURRENCY = int(os.getenv("CRAWL4AI_MAX_CONCURRENCY", "8"))
+CRAWL4AI_TIMEOUT = float(os.getenv("CRAWL4AI_TIMEOUT", "300"))
+CRAWL4AI_MAX_RETRIES = int(os.getenv("CRAWL4AI_MAX_RETRIES", "2"))
+
+# Per-debtor files: data/<debtor_id>/crawled_pages/*.md
+DEBTOR_DATA_PATH = os.path.join(PROJECT_ROOT, 'data')
+
+# Crawl job queue, in its own database so it survives rebuilds of the enrichment database by init_db
+CRAWL_QUEUE_DB_PATH = os.path.join(PROJECT_ROOT, 'data/crawl_queue.sqlite')
+CRAWL_JOB_LEASE_SECONDS = float(os.getenv("CRAWL_JOB_LEASE_SECONDS", "900"))
+CRAWL_JOB_MAX_ATTEMPTS = int(os.getenv("CRAWL_JOB_MAX_ATTEMPTS", "3"))
+CRAWL_JOB_BATCH_SIZE = int(os.getenv("CRAWL_JOB_BATCH_SIZE", "20"))
+
+# Politeness towards each crawled site (registrable domain)
+CRAWL_DOMAIN_MAX_CONCURRENCY = int(os.getenv("CRAWL_DOMAIN_MAX_CONCURRENCY", "2"))
+CRAWL_DOMAIN_MIN_DELAY = float(os.getenv("CRAWL_DOMAIN_MIN_DELAY", "2.0"))
+CRAWL_DOMAIN_MAX_DELAY = float(os.getenv("CRAWL_DOMAIN_MAX_DELAY", "300"))
+
+# Registry of crawled pages by canonical URL, shared by the debtors that reference them
+CRAWL_REGISTRY_DB_PATH = os.path.join(PROJECT_ROOT, 'data/crawl_registry.sqlite')
+CRAWL_FRESHNESS_DAYS = float(os.getenv("CRAWL_FRESHNESS_DAYS", "30"))
+CRAWL_REGISTRY_MAX_BYTES = int(os.getenv("CRAWL_REGISTRY_MAX_BYTES", str(10 * 1024 ** 3)))
+
 
 COUNTRY_CONFIG = {
     1: {
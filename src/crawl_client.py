@@ -0,0 +1,215 @@
+import asyncio
+import importlib.util
+import json
+import urllib.parse
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+
+import httpx
+
+from config import CRAWL4AI_BASE_URL, CRAWL4AI_MAX_CONCURRENCY, CRAWL4AI_MAX_RETRIES, CRAWL4AI_TIMEOUT
+from utils import backoff_delay, retry_after_delay
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_BROWSER_PARAMS = {'headless': True}
+DEFAULT_CRAWLER_PARAMS = {'cache_mode': 'BYPASS'}
+
+
+class Crawl4AIError(Exception):
+    """A request to the Crawl4AI service failed after its retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CrawlPage(NamedTuple):
+    """One crawled page, as returned by the Crawl4AI REST API."""
+    url: str
+    success: bool
+    status_code: Optional[int]
+    markdown: str
+    fit_markdown: str
+    html: str
+    links: Dict[str, List[Dict[str, Any]]]
+    metadata: Dict[str, Any]
+    response_headers: Dict[str, str]
+    redirected_url: Optional[str]
+    error_message: Optional[str]
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'CrawlPage':
+        markdown = data.get('markdown') or ''
+        if isinstance(markdown, dict):
+            raw_markdown = markdown.get('raw_markdown') or ''
+            fit_markdown = markdown.get('fit_markdown') or ''
+        else:
+            raw_markdown, fit_markdown = markdown, ''
+        return cls(
+            url=data.get('url', ''),
+            success=bool(data.get('success')),
+            status_code=data.get('status_code'),
+            markdown=raw_markdown,
+            fit_markdown=fit_markdown,
+            html=data.get('html') or '',
+            links=data.get('links') or {},
+            metadata=data.get('metadata') or {},
+            response_headers={name.lower(): value for name, value in (data.get('response_headers') or {}).items()},
+            redirected_url=data.get('redirected_url'),
+            error_message=data.get('error_message'),
+        )
+
+
+def build_crawl_payload(urls: Iterable[str], crawler_params: Optional[Dict[str, Any]] = None,
+                        browser_params: Optional[Dict[str, Any]] = None, stream: bool = False) -> Dict[str, Any]:
+    """Builds the body of a /crawl or /crawl/stream request."""
+    crawler_params = {**DEFAULT_CRAWLER_PARAMS, **(crawler_params or {})}
+    if stream:
+        crawler_params['stream'] = True
+    return {
+        'urls': list(urls),
+        'browser_config': {'type': 'BrowserConfig', 'params': {**DEFAULT_BROWSER_PARAMS, **(browser_params or {})}},
+        'crawler_config': {'type': 'CrawlerRunConfig', 'params': crawler_params},
+    }
+
+
+class Crawl4AIClient:
+    """
+    An async client of the Crawl4AI REST API (/crawl, /crawl/stream, /md and /llm).
+
+    All requests share one pooled httpx.AsyncClient with keep-alive
+    connections, using HTTP/2 when the 'h2' package is installed and the
+    service is served over TLS. At most max_concurrency requests are in
+    flight at once; transient failures (connection errors, 429 and 5xx)
+    are retried with backoff, honoring Retry-After, and raise
+    Crawl4AIError once the retries are exhausted.
+
+    Use it as an async context manager, or call close() when done:
+
+        async with Crawl4AIClient() as client:
+            pages = await client.crawl(['https://example.com'])
+    """
+
+    def __init__(self, base_url: str = CRAWL4AI_BASE_URL, max_concurrency: int = CRAWL4AI_MAX_CONCURRENCY,
+                 timeout: float = CRAWL4AI_TIMEOUT, max_retries: int = CRAWL4AI_MAX_RETRIES,
+                 http2: Optional[bool] = None):
+        if http2 is None:
+            http2 = importlib.util.find_spec('h2') is not None
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        self._client = httpx.AsyncClient(base_url=base_url, limits=limits, http2=http2,
+                                         timeout=httpx.Timeout(timeout, connect=10.0))
+
+    async def __aenter__(self) -> 'Crawl4AIClient':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
+        """Sends a request with retries and returns its decoded JSON body."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self._client.request(method, endpoint, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise Crawl4AIError(f"{method} {endpoint} failed: {e!r}") from e
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                await asyncio.sleep(retry_after_delay(response) or backoff_delay(attempt))
+                continue
+            if response.is_error:
+                raise Crawl4AIError(f"{method} {endpoint} returned {response.status_code}: {response.text[:200]}",
+                                    response.status_code)
+            try:
+                return response.json()
+            except ValueError as e:
+                raise Crawl4AIError(f"{method} {endpoint} returned invalid JSON: {e}") from e
+        raise Crawl4AIError(f"{method} {endpoint} failed")
+
+    async def health(self) -> Dict[str, Any]:
+        """Returns the health report of the service, with its version."""
+        return await self._request('GET', '/health')
+
+    async def crawl(self, urls: Iterable[str], crawler_params: Optional[Dict[str, Any]] = None,
+                    browser_params: Optional[Dict[str, Any]] = None) -> List[CrawlPage]:
+        """
+        Crawls URLs with /crawl and returns their pages once all are done.
+
+        Args:
+            urls: The URLs to crawl.
+            crawler_params: CrawlerRunConfig parameters, over DEFAULT_CRAWLER_PARAMS.
+            browser_params: BrowserConfig parameters, over DEFAULT_BROWSER_PARAMS.
+        """
+        data = await self._request('POST', '/crawl', json=build_crawl_payload(urls, crawler_params, browser_params))
+        if not data.get('success'):
+            raise Crawl4AIError(f"/crawl reported a failure: {str(data)[:200]}")
+        return [CrawlPage.from_json(result) for result in data.get('results', [])]
+
+    async def crawl_stream(self, urls: Iterable[str], crawler_params: Optional[Dict[str, Any]] = None,
+                           browser_params: Optional[Dict[str, Any]] = None) -> AsyncIterator[CrawlPage]:
+        """
+        Crawls URLs with /crawl/stream and yields each page as soon as the
+        service sends it. The request is retried only if it fails before
+        the first page, so no page is yielded twice.
+        """
+        payload = build_crawl_payload(urls, crawler_params, browser_params, stream=True)
+        for attempt in range(self.max_retries + 1):
+            received = False
+            try:
+                async with self._semaphore:
+                    async with self._client.stream('POST', '/crawl/stream', json=payload) as response:
+                        if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                            await asyncio.sleep(retry_after_delay(response) or backoff_delay(attempt))
+                            continue
+                        if response.is_error:
+                            await response.aread()
+                            raise Crawl4AIError(
+                                f"/crawl/stream returned {response.status_code}: {response.text[:200]}",
+                                response.status_code
+                            )
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            try:
+                                data = json.loads(line)
+                            except ValueError as e:
+                                raise Crawl4AIError(f"/crawl/stream sent an invalid line: {line[:200]}") from e
+                            if data.get('status') == 'completed':
+                                return
+                            if data.get('url'):
+                                received = True
+                                yield CrawlPage.from_json(data)
+                        raise Crawl4AIError("/crawl/stream ended without its 'completed' marker")
+            except httpx.TransportError as e:
+                if received or attempt == self.max_retries:
+                    raise Crawl4AIError(f"/crawl/stream failed: {e!r}") from e
+                await asyncio.sleep(backoff_delay(attempt))
+        raise Crawl4AIError("/crawl/stream failed")
+
+    async def markdown(self, url: str, content_filter: str = 'fit', query: Optional[str] = None,
+                       cache: str = '0') -> str:
+        """
+        Returns the markdown of one page with /md.
+
+        Args:
+            url: The page to convert.
+            content_filter: 'raw', 'fit', 'bm25' or 'llm'.
+            query: The query of the 'bm25' and 'llm' filters.
+            cache: '1' to let the service answer from its cache.
+        """
+        data = await self._request('POST', '/md', json={'url': url, 'f': content_filter, 'q': query, 'c': cache})
+        return data.get('markdown', '')
+
+    async def ask(self, url: str, question: str) -> str:
+        """Asks the LLM of the service a question about one page with /llm."""
+        encoded_url = urllib.parse.quote_plus(url, safe='')
+        data = await self._request('GET', f'/llm/{encoded_url}', params={'q': question})
+        return data.get('answer', '')
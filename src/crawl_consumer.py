@@ -0,0 +1,77 @@
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urlparse
+
+from config import DEBTOR_DATA_PATH
+from crawl_client import CrawlPage
+from extraction_profiles import ExtractionProfile
+from operational_status import StatusSignal, crawl_signals
+from structured_extractor import CONTACT_FIELDS, extract_crawl_contacts
+
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+class CrawledPageResult(NamedTuple):
+    """What was kept of one crawled page once it was written and extracted."""
+    debtor_id: int
+    url: str
+    success: bool
+    path: Optional[str]
+    contacts: Dict[str, Set[str]]
+    status_signals: List[StatusSignal]
+    error_message: Optional[str]
+
+
+def get_crawled_pages_directory(debtor_id: int) -> str:
+    """Returns data/<debtor_id>/crawled_pages, where the markdown of a debtor's pages is written."""
+    return os.path.join(DEBTOR_DATA_PATH, str(debtor_id), 'crawled_pages')
+
+
+def page_filename(url: str) -> str:
+    """
+    Names the markdown file of a page after its URL, with a short hash of the
+    full URL so pages differing only by query string do not collide:
+    'www.example.com-contact-3f2a9c1e.md'.
+    """
+    parsed = urlparse(url)
+    slug = _UNSAFE_FILENAME_CHARS.sub('-', f'{parsed.netloc}{parsed.path}').strip('-.')[:80] or 'page'
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=4).hexdigest()
+    return f'{slug}-{digest}.md'
+
+
+def write_page(directory: str, page: CrawlPage) -> str:
+    """
+    Writes the markdown of a page with a small front matter (URL, status, crawl time).
+    The file is replaced atomically, so a crash never leaves a truncated page.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, page_filename(page.url))
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write('---\n')
+        f.write(f'url: {page.url}\n')
+        if page.redirected_url and page.redirected_url != page.url:
+            f.write(f'redirected_url: {page.redirected_url}\n')
+        f.write(f'status_code: {page.status_code}\n')
+        f.write(f"crawled_at: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\n")
+        f.write('---\n\n')
+        f.write(page.markdown)
+    os.replace(temp_path, path)
+    return path
+
+
+def process_page(debtor_id: int, page: CrawlPage, profile: ExtractionProfile,
+                 directory: Optional[str] = None) -> CrawledPageResult:
+    """Writes a crawled page to the debtor's directory and extracts its contacts and status signals."""
+    path = None
+    contacts: Dict[str, Set[str]] = {field: set() for field in CONTACT_FIELDS}
+    if page.success:
+        if page.markdown:
+            path = write_page(directory or get_crawled_pages_directory(debtor_id), page)
+        contacts = extract_crawl_contacts(page, profile)
+    return CrawledPageResult(debtor_id, page.url, page.success, path, contacts, crawl_signals([page]),
+                             page.error_message)
+
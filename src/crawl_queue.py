@@ -0,0 +1,387 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from config import (
+    CRAWL_JOB_BATCH_SIZE,
+    CRAWL_JOB_LEASE_SECONDS,
+    CRAWL_JOB_MAX_ATTEMPTS,
+    CRAWL_QUEUE_DB_PATH,
+)
+from crawl_client import Crawl4AIClient, CrawlPage
+from crawl_consumer import process_page
+from crawl_registry import CrawlRegistry, get_crawl_registry
+from crawl_scheduler import PolitenessScheduler
+from extraction_profiles import ExtractionProfile, get_profile_for_debtor
+from serp_store import get_serp_store
+from utils import canonicalize_url, select_relevant_sites
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+JOB_STATES = (PENDING, LEASED, DONE, FAILED)
+
+# Delay before a failed job is retried: RETRY_BASE_DELAY * 2 ** (attempts - 1), at most RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 60.0
+RETRY_MAX_DELAY = 3600.0
+
+
+class CrawlJob(NamedTuple):
+    """A URL of a debtor to crawl, as claimed from the queue."""
+    id: int
+    debtor_id: int
+    url: str
+    priority: int
+    attempts: int
+
+
+def default_worker_id() -> str:
+    """Identifies the leases of this process: '<hostname>:<pid>'."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class CrawlQueue:
+    """
+    A durable queue of crawl jobs, in the 'CrawlJobs' table of its own
+    database, which init_db rebuilds never touch.
+
+    Jobs go from 'pending' to 'leased' when a worker claims them, then to
+    'done', or back to 'pending' with a retry delay when they fail, until
+    max_attempts is reached and they become 'failed'. A lease that is not
+    completed before it expires (the worker crashed or was stopped) is
+    claimable again, so a long run resumes where it stopped and several
+    worker processes can share the queue: a batch is claimed with a single
+    UPDATE ... RETURNING statement, which SQLite runs atomically.
+    """
+
+    def __init__(self, db_path: str = CRAWL_QUEUE_DB_PATH, lease_seconds: float = CRAWL_JOB_LEASE_SECONDS,
+                 max_attempts: int = CRAWL_JOB_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Workers of other processes may hold the write lock for a moment
+        self.conn = sqlite3.connect(db_path, timeout=30.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS CrawlJobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            debtor_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            priority INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            UNIQUE (debtor_id, url)
+        )
+        ''')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS IX_CrawlJobs_Claim ON CrawlJobs (state, priority DESC, available_at, id)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_CrawlJobs_Lease ON CrawlJobs (state, lease_expires_at)')
+        self.conn.commit()
+
+    def enqueue(self, debtor_id: int, urls: Iterable[str], priority: int = 0) -> int:
+        """
+        Adds the URLs of a debtor to the queue. URLs already queued for the
+        debtor, whatever their state, are left as they are.
+
+        Returns:
+            The number of jobs added.
+        """
+        return self.enqueue_many((debtor_id, url, priority) for url in urls)
+
+    def enqueue_many(self, jobs: Iterable[Tuple[int, str, int]]) -> int:
+        """Adds (debtor_id, url, priority) jobs in one transaction; returns the number added."""
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.executemany(
+                'INSERT OR IGNORE INTO CrawlJobs '
+                '(debtor_id, url, priority, available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                ((debtor_id, url, priority, now, now, now) for debtor_id, url, priority in jobs)
+            )
+            return cursor.rowcount
+
+    def _expire_leases(self, now: float):
+        """Returns the jobs of expired leases to 'pending', or to 'failed' when out of attempts."""
+        self.conn.execute(
+            "UPDATE CrawlJobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires_at = NULL, last_error = 'Lease expired', updated_at = ? "
+            "WHERE state = 'leased' AND lease_expires_at <= ?",
+            (self.max_attempts, now, now)
+        )
+
+    def claim(self, limit: int = CRAWL_JOB_BATCH_SIZE, worker_id: Optional[str] = None) -> List[CrawlJob]:
+        """
+        Leases up to limit pending jobs for lease_seconds, highest priority first.
+
+        Returns:
+            The claimed jobs, highest priority and oldest first.
+        """
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with self.conn:
+            self._expire_leases(now)
+            rows = self.conn.execute(
+                "UPDATE CrawlJobs SET state = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, updated_at = ? "
+                "WHERE id IN ("
+                "    SELECT id FROM CrawlJobs WHERE state = 'pending' AND available_at <= ? "
+                "    ORDER BY priority DESC, id LIMIT ?"
+                ") RETURNING id, debtor_id, url, priority, attempts",
+                (worker_id, now + self.lease_seconds, now, now, limit)
+            ).fetchall()
+        jobs = [CrawlJob(*row) for row in rows]
+        jobs.sort(key=lambda job: (-job.priority, job.id))
+        return jobs
+
+    def extend_leases(self, job_ids: Sequence[int], worker_id: Optional[str] = None) -> int:
+        """Renews the leases of jobs still running; returns the number of leases renewed."""
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with self.conn:
+            return self.conn.executemany(
+                "UPDATE CrawlJobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                ((now + self.lease_seconds, now, job_id, worker_id) for job_id in job_ids)
+            ).rowcount
+
+    def complete(self, job_ids: Sequence[int], worker_id: Optional[str] = None) -> int:
+        """
+        Marks leased jobs as done. Jobs whose lease was lost (it expired and
+        another worker claimed them) are not changed.
+
+        Returns:
+            The number of jobs marked as done.
+        """
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with self.conn:
+            return self.conn.executemany(
+                "UPDATE CrawlJobs SET state = 'done', lease_owner = NULL, lease_expires_at = NULL, "
+                "last_error = NULL, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                ((now, job_id, worker_id) for job_id in job_ids)
+            ).rowcount
+
+    def fail(self, job_id: int, error: str, worker_id: Optional[str] = None,
+             retry_delay: Optional[float] = None) -> Optional[str]:
+        """
+        Records the failure of a leased job. It is retried after retry_delay
+        (exponential in its attempts by default), or marked as failed once it
+        has used max_attempts.
+
+        Returns:
+            The new state of the job, or None if its lease was lost.
+        """
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT attempts FROM CrawlJobs WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            if retry_delay is None:
+                retry_delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+            self.conn.execute(
+                "UPDATE CrawlJobs SET state = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (state, now + retry_delay, error[:1000], now, job_id)
+            )
+        return state
+
+    def release(self, job_ids: Sequence[int], worker_id: Optional[str] = None) -> int:
+        """Returns leased jobs to 'pending' without counting the attempt, e.g. on shutdown."""
+        worker_id = worker_id or default_worker_id()
+        now = time.time()
+        with self.conn:
+            return self.conn.executemany(
+                "UPDATE CrawlJobs SET state = 'pending', attempts = MAX(0, attempts - 1), lease_owner = NULL, "
+                "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                ((now, job_id, worker_id) for job_id in job_ids)
+            ).rowcount
+
+    def retry_failed(self) -> int:
+        """Returns every failed job to 'pending' with fresh attempts; returns their number."""
+        now = time.time()
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE CrawlJobs SET state = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE state = 'failed'",
+                (now, now)
+            ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of jobs in each state."""
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update(self.conn.execute('SELECT state, COUNT(*) FROM CrawlJobs GROUP BY state'))
+        return counts
+
+    def close(self):
+        self.conn.close()
+
+
+_crawl_queue: Optional[CrawlQueue] = None
+
+
+def get_crawl_queue() -> CrawlQueue:
+    """Returns the process-wide crawl job queue."""
+    global _crawl_queue
+    if _crawl_queue is None:
+        _crawl_queue = CrawlQueue()
+    return _crawl_queue
+
+
+def enqueue_relevant_sites(crawl_queue: Optional[CrawlQueue] = None, debtor_ids: Optional[Iterable[int]] = None,
+                           priority: int = 0) -> int:
+    """
+    Queues the links of the relevant sites (`select_relevant_sites`) of the
+    searches in the SERP store. Links already queued are not queued again,
+    so this can be run after every batch of searches, and the links of a
+    debtor that share a canonical URL (`canonicalize_url`) are queued once.
+
+    Returns:
+        The number of jobs added.
+    """
+    crawl_queue = crawl_queue or get_crawl_queue()
+    jobs = []
+    for debtor_id, serp_data in get_serp_store().iter_searches(debtor_ids):
+        organic_results = serp_data['organic_results']
+        canonical_urls = set()
+        for position in select_relevant_sites(serp_data):
+            link = organic_results[position - 1].get('link')
+            if link and canonicalize_url(link) not in canonical_urls:
+                canonical_urls.add(canonicalize_url(link))
+                jobs.append((debtor_id, link, priority))
+    return crawl_queue.enqueue_many(jobs)
+
+
+async def _run_jobs(scheduler: PolitenessScheduler, registry: CrawlRegistry, crawl_queue: CrawlQueue,
+                    jobs: List[CrawlJob], worker_id: str, profiles: Dict[int, ExtractionProfile]) -> Dict[str, int]:
+    """
+    Crawls claimed jobs through the scheduler, writes and extracts their
+    pages and records their outcome. Jobs sharing a canonical URL are
+    crawled once, and jobs whose page is fresh in the registry are not
+    crawled at all: the page is delivered to each of their debtors.
+    """
+    outcome = {'done': 0, 'shared': 0, 'retried': 0, 'failed': 0}
+    jobs_by_url: Dict[str, List[CrawlJob]] = {}
+    for job in jobs:
+        jobs_by_url.setdefault(canonicalize_url(job.url), []).append(job)
+    remaining = {job.id for job in jobs}
+
+    async def deliver(page: CrawlPage, url_jobs: List[CrawlJob], crawled: bool):
+        for job in url_jobs:
+            if job.debtor_id not in profiles:
+                profiles[job.debtor_id] = get_profile_for_debtor(job.debtor_id)
+            await asyncio.to_thread(process_page, job.debtor_id, page, profiles[job.debtor_id])
+        outcome['done'] += crawl_queue.complete([job.id for job in url_jobs], worker_id)
+        outcome['shared'] += len(url_jobs) - crawled
+        remaining.difference_update(job.id for job in url_jobs)
+
+    # The URL submitted for each canonical URL: the first one referenced
+    submitted: Dict[Tuple[int, str], str] = {}
+    for canonical_url, url_jobs in jobs_by_url.items():
+        page = registry.get(canonical_url)
+        if page is not None:
+            registry.link(canonical_url, (job.debtor_id for job in url_jobs))
+            await deliver(page, url_jobs, crawled=False)
+        else:
+            submitted[(url_jobs[0].debtor_id, url_jobs[0].url)] = canonical_url
+            scheduler.submit(url_jobs[0].debtor_id, url_jobs[0].url)
+
+    # Polite delays can hold a batch for long, so leases are renewed well before they expire
+    renew_every = crawl_queue.lease_seconds / 3
+    renewed_at = time.monotonic()
+    async for result in scheduler.iter_results():
+        canonical_url = submitted.pop((result.debtor_id, result.url), None)
+        if canonical_url is None:
+            continue
+        url_jobs = jobs_by_url[canonical_url]
+        if result.error is None and result.page is not None and result.page.success:
+            # Only 2xx pages are registered, so a blocked answer is never reused for other debtors
+            registry.put(canonical_url, result.page, (job.debtor_id for job in url_jobs))
+            await deliver(result.page, url_jobs, crawled=True)
+        else:
+            error = result.error or (result.page.error_message if result.page else None) or 'Crawl failed'
+            for job in url_jobs:
+                state = crawl_queue.fail(job.id, error, worker_id)
+                if state == FAILED:
+                    outcome['failed'] += 1
+                elif state == PENDING:
+                    outcome['retried'] += 1
+                remaining.discard(job.id)
+        if remaining and time.monotonic() - renewed_at > renew_every:
+            crawl_queue.extend_leases(list(remaining), worker_id)
+            renewed_at = time.monotonic()
+    return outcome
+
+
+async def run_crawl_worker(client: Crawl4AIClient, crawl_queue: Optional[CrawlQueue] = None,
+                           batch_size: int = CRAWL_JOB_BATCH_SIZE, worker_id: Optional[str] = None,
+                           idle_seconds: Optional[float] = None,
+                           scheduler: Optional[PolitenessScheduler] = None,
+                           registry: Optional[CrawlRegistry] = None) -> Dict[str, int]:
+    """
+    Claims batches of jobs and crawls them through a PolitenessScheduler,
+    which paces the requests to each site, until the queue has no
+    claimable job. Pages still fresh in the crawl registry are reused
+    instead of being crawled again; the registry is evicted after each batch.
+
+    Args:
+        client: The Crawl4AI client; its semaphore bounds the crawls in flight.
+        crawl_queue: The queue (the process-wide queue by default).
+        batch_size: The number of jobs claimed at once.
+        worker_id: The owner of the leases (hostname and PID by default).
+        idle_seconds: When set, waits this long for new jobs instead of
+            returning when the queue is empty.
+        scheduler: The scheduler of the requests; one is made for the client
+            by default, and kept across batches so the pace of each site is too.
+        registry: The registry of crawled pages (the process-wide one by default).
+
+    Returns:
+        The number of jobs done (of which 'shared' got a page crawled for
+        another job), retried later and failed.
+    """
+    crawl_queue = crawl_queue or get_crawl_queue()
+    worker_id = worker_id or default_worker_id()
+    scheduler = scheduler or PolitenessScheduler(client)
+    registry = registry or get_crawl_registry()
+    profiles: Dict[int, ExtractionProfile] = {}
+    summary = {'done': 0, 'shared': 0, 'retried': 0, 'failed': 0}
+    while True:
+        jobs = crawl_queue.claim(batch_size, worker_id)
+        if not jobs:
+            if idle_seconds is None:
+                break
+            await asyncio.sleep(idle_seconds)
+            continue
+
+        try:
+            outcome = await _run_jobs(scheduler, registry, crawl_queue, jobs, worker_id, profiles)
+        except asyncio.CancelledError:
+            crawl_queue.release([job.id for job in jobs], worker_id)
+            raise
+        for key, count in outcome.items():
+            summary[key] += count
+        registry.evict()
+    print(f"Crawl worker {worker_id}: {summary['done']} jobs done ({summary['shared']} from shared pages), "
+          f"{summary['retried']} to retry, {summary['failed']} failed.")
+    return summary
@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Iterable, List, Optional
+
+from config import CRAWL_FRESHNESS_DAYS, CRAWL_REGISTRY_DB_PATH, CRAWL_REGISTRY_MAX_BYTES
+from crawl_client import CrawlPage
+from utils import canonicalize_url
+
+
+class CrawlRegistry:
+    """
+    A SQLite-backed registry of crawled pages keyed on their canonical URL
+    (`utils.canonicalize_url`), so a page referenced by many debtors (a
+    directory listing, a franchise site, the same link with tracking
+    parameters) is crawled once per freshness window and its result is
+    reused for every one of them.
+
+    Only pages loaded with a 2xx status are kept. The debtors a page was
+    delivered to are recorded with it. Entries are evicted when stale, and
+    least recently used entries are dropped when the registry grows past
+    its byte size limit. Several worker processes may share the registry.
+    """
+
+    def __init__(self, db_path: str = CRAWL_REGISTRY_DB_PATH, freshness_days: float = CRAWL_FRESHNESS_DAYS,
+                 max_bytes: int = CRAWL_REGISTRY_MAX_BYTES):
+        self.db_path = db_path
+        self.freshness_seconds = freshness_days * 86400
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30.0)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS CrawledPages (
+            canonical_url TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status_code INTEGER,
+            payload BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            crawled_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS CrawledPageDebtors (
+            canonical_url TEXT NOT NULL,
+            debtor_id INTEGER NOT NULL,
+            PRIMARY KEY (canonical_url, debtor_id)
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_CrawledPages_CrawledAt ON CrawledPages (crawled_at)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_CrawledPages_LastAccess ON CrawledPages (last_access)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_CrawledPageDebtors_DebtorId ON CrawledPageDebtors (debtor_id)')
+        self.conn.commit()
+
+    def get(self, url: str) -> Optional[CrawlPage]:
+        """Returns the page crawled for this URL or any URL of the same canonical form, if still fresh."""
+        canonical_url = canonicalize_url(url)
+        now = time.time()
+        row = self.conn.execute(
+            'SELECT payload FROM CrawledPages WHERE canonical_url = ? AND crawled_at > ?',
+            (canonical_url, now - self.freshness_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute('UPDATE CrawledPages SET last_access = ? WHERE canonical_url = ?', (now, canonical_url))
+        self.conn.commit()
+        return CrawlPage(**json.loads(zlib.decompress(row[0])))
+
+    def put(self, url: str, page: CrawlPage, debtor_ids: Iterable[int] = ()) -> Optional[str]:
+        """
+        Registers the page crawled for a URL, linked to the debtors it is
+        delivered to, and returns its canonical URL. Only pages loaded with
+        a 2xx status are registered: for the others (failures, throttled or
+        blocked answers) None is returned.
+        """
+        if not page.success or page.status_code is None or not 200 <= page.status_code < 300:
+            return None
+        canonical_url = canonicalize_url(url)
+        payload = zlib.compress(json.dumps(page._asdict(), ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO CrawledPages '
+                '(canonical_url, url, status_code, payload, size, crawled_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (canonical_url, page.url, page.status_code, payload, len(payload), now, now)
+            )
+            self._link(canonical_url, debtor_ids)
+        return canonical_url
+
+    def _link(self, canonical_url: str, debtor_ids: Iterable[int]):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO CrawledPageDebtors (canonical_url, debtor_id) VALUES (?, ?)',
+            ((canonical_url, debtor_id) for debtor_id in debtor_ids)
+        )
+
+    def link(self, url: str, debtor_ids: Iterable[int]) -> str:
+        """Records that the page of a URL was delivered to these debtors and returns its canonical URL."""
+        canonical_url = canonicalize_url(url)
+        with self.conn:
+            self._link(canonical_url, debtor_ids)
+        return canonical_url
+
+    def debtor_ids(self, url: str) -> List[int]:
+        """Returns the debtors the page of a URL was delivered to."""
+        return [row[0] for row in self.conn.execute(
+            'SELECT debtor_id FROM CrawledPageDebtors WHERE canonical_url = ? ORDER BY debtor_id',
+            (canonicalize_url(url),)
+        )]
+
+    def evict(self, max_age_days: Optional[float] = None) -> int:
+        """
+        Removes the pages older than the freshness window (or max_age_days),
+        then least recently used pages until the size limit is met.
+
+        Returns:
+            The number of pages removed.
+        """
+        max_age_seconds = self.freshness_seconds if max_age_days is None else max_age_days * 86400
+        with self.conn:
+            removed = self.conn.execute(
+                'DELETE FROM CrawledPages WHERE crawled_at <= ?', (time.time() - max_age_seconds,)
+            ).rowcount
+
+            total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM CrawledPages').fetchone()[0]
+            if total_size > self.max_bytes:
+                excess_size = total_size - self.max_bytes
+                to_delete = []
+                for canonical_url, size in self.conn.execute(
+                    'SELECT canonical_url, size FROM CrawledPages ORDER BY last_access'
+                ):
+                    if excess_size <= 0:
+                        break
+                    to_delete.append((canonical_url,))
+                    excess_size -= size
+                self.conn.executemany('DELETE FROM CrawledPages WHERE canonical_url = ?', to_delete)
+                removed += len(to_delete)
+
+            self.conn.execute(
+                'DELETE FROM CrawledPageDebtors WHERE canonical_url NOT IN (SELECT canonical_url FROM CrawledPages)'
+            )
+        if removed:
+            print(f"Evicted {removed} pages from the crawl registry.")
+        return removed
+
+    def close(self):
+        self.conn.close()
+
+
+_crawl_registry: Optional[CrawlRegistry] = None
+
+
+def get_crawl_registry() -> CrawlRegistry:
+    """Returns the process-wide crawl registry."""
+    global _crawl_registry
+    if _crawl_registry is None:
+        _crawl_registry = CrawlRegistry()
+    return _crawl_registry
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, NamedTuple, Optional, Tuple
+
+from config import (
+    CRAWL4AI_MAX_CONCURRENCY,
+    CRAWL_DOMAIN_MAX_CONCURRENCY,
+    CRAWL_DOMAIN_MAX_DELAY,
+    CRAWL_DOMAIN_MIN_DELAY,
+)
+from crawl_client import Crawl4AIClient, Crawl4AIError, CrawlPage
+from utils import parse_retry_after, registrable_domain
+
+# Statuses by which a site asks to slow down
+THROTTLE_STATUS_CODES = {429, 503}
+# Sites quick to block crawlers: (max concurrency, min delay in seconds between requests)
+DOMAIN_POLICIES = {
+    'facebook.com': (1, 10.0),
+    'instagram.com': (1, 10.0),
+    'linkedin.com': (1, 15.0),
+    'google.com': (1, 10.0),
+    'pagesjaunes.ca': (1, 5.0),
+    'yellowpages.ca': (1, 5.0),
+}
+
+
+class PoliteCrawlResult(NamedTuple):
+    """
+    The outcome of one scheduled URL. error is set when the URL failed, even
+    with a page (the site still throttled it after its retries).
+    """
+    debtor_id: int
+    url: str
+    page: Optional[CrawlPage]
+    error: Optional[str]
+
+
+class _DomainState:
+    """The queued URLs and the pace of one registrable domain."""
+
+    def __init__(self, max_concurrency: int, min_delay: float):
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.delay = min_delay
+        self.pending: Deque[Tuple[int, str, int]] = deque()
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.in_ring = False
+
+    def can_start(self, now: float) -> bool:
+        return bool(self.pending) and self.in_flight < self.max_concurrency and now >= self.next_start
+
+
+class PolitenessScheduler:
+    """
+    Dispatches URLs to the Crawl4AI client without hammering any site.
+
+    URLs are grouped by registrable domain. Each domain has at most
+    max_per_domain requests in flight and starts one at most every
+    min_delay seconds (DOMAIN_POLICIES are stricter for the sites quick to
+    block), and domains take turns in round-robin order, so one directory
+    shared by many debtors cannot starve the others.
+
+    When a site answers 429 or 503, its URL is retried later, the domain
+    waits for its Retry-After (or its doubled delay, up to max_delay), and
+    its delay then decays back to min_delay with each successful request.
+
+    The scheduler keeps the pace of each domain between calls of
+    iter_results, so it can be fed batch after batch.
+    """
+
+    def __init__(self, client: Crawl4AIClient, max_per_domain: int = CRAWL_DOMAIN_MAX_CONCURRENCY,
+                 min_delay: float = CRAWL_DOMAIN_MIN_DELAY, max_delay: float = CRAWL_DOMAIN_MAX_DELAY,
+                 max_in_flight: int = CRAWL4AI_MAX_CONCURRENCY, max_retries: int = 2,
+                 domain_policies: Optional[Dict[str, Tuple[int, float]]] = None,
+                 crawler_params: Optional[Dict[str, Any]] = None):
+        self.client = client
+        self.max_per_domain = max_per_domain
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.domain_policies = DOMAIN_POLICIES if domain_policies is None else domain_policies
+        self.crawler_params = crawler_params
+        self._domains: Dict[str, _DomainState] = {}
+        # Domains with queued URLs, in round-robin order
+        self._ring: Deque[str] = deque()
+
+    def _domain_state(self, domain: str) -> _DomainState:
+        state = self._domains.get(domain)
+        if state is None:
+            max_concurrency, min_delay = self.domain_policies.get(domain, (self.max_per_domain, self.min_delay))
+            state = self._domains[domain] = _DomainState(max_concurrency, min_delay)
+        return state
+
+    def _queue(self, domain: str, state: _DomainState, item: Tuple[int, str, int], first: bool = False):
+        if first:
+            state.pending.appendleft(item)
+        else:
+            state.pending.append(item)
+        if not state.in_ring:
+            state.in_ring = True
+            self._ring.append(domain)
+
+    def submit(self, debtor_id: int, url: str):
+        """Queues a URL of a debtor."""
+        domain = registrable_domain(url)
+        self._queue(domain, self._domain_state(domain), (debtor_id, url, 0))
+
+    @property
+    def pending_count(self) -> int:
+        return sum(len(self._domains[domain].pending) for domain in self._ring)
+
+    def _start_ready(self, now: float, tasks: Dict[asyncio.Task, Tuple[str, Tuple[int, str, int]]]):
+        """Starts requests in round-robin order, one per ready domain per turn, while capacity remains."""
+        started = True
+        while started and len(tasks) < self.max_in_flight:
+            started = False
+            for _ in range(len(self._ring)):
+                if len(tasks) >= self.max_in_flight:
+                    break
+                domain = self._ring[0]
+                self._ring.rotate(-1)
+                state = self._domains[domain]
+                if not state.can_start(now):
+                    continue
+                item = state.pending.popleft()
+                state.in_flight += 1
+                state.next_start = now + state.delay
+                tasks[asyncio.create_task(self._crawl(item[1]))] = (domain, item)
+                started = True
+
+        for _ in range(len(self._ring)):
+            domain = self._ring.popleft()
+            if self._domains[domain].pending:
+                self._ring.append(domain)
+            else:
+                self._domains[domain].in_ring = False
+
+    def _next_start(self) -> Optional[float]:
+        """The earliest time a domain with queued URLs and free capacity may start a request."""
+        times = [state.next_start for state in (self._domains[domain] for domain in self._ring)
+                 if state.pending and state.in_flight < state.max_concurrency]
+        return min(times) if times else None
+
+    async def _crawl(self, url: str) -> Optional[CrawlPage]:
+        pages = await self.client.crawl([url], self.crawler_params)
+        return pages[0] if pages else None
+
+    def _finish(self, domain: str, item: Tuple[int, str, int], task: asyncio.Task,
+                now: float) -> Optional[PoliteCrawlResult]:
+        """Records the outcome of a request; returns None when its URL was queued again."""
+        state = self._domains[domain]
+        state.in_flight -= 1
+        debtor_id, url, attempts = item
+        page, error = None, None
+        try:
+            page = task.result()
+        except Crawl4AIError as e:
+            error = str(e)
+
+        if page is not None and page.status_code in THROTTLE_STATUS_CODES:
+            retry_after = parse_retry_after(page.response_headers.get('retry-after'))
+            state.delay = min(self.max_delay, max(state.delay * 2, state.min_delay))
+            pause = min(self.max_delay, retry_after) if retry_after is not None else state.delay
+            state.next_start = max(state.next_start, now + pause)
+            if attempts < self.max_retries:
+                self._queue(domain, state, (debtor_id, url, attempts + 1), first=True)
+                return None
+            error = f'{domain} answered {page.status_code} after {attempts + 1} attempts'
+        elif page is not None:
+            state.delay = max(state.min_delay, state.delay / 2)
+        elif error is None:
+            error = 'The crawl returned no page'
+        return PoliteCrawlResult(debtor_id, url, page, error)
+
+    async def iter_results(self) -> AsyncIterator[PoliteCrawlResult]:
+        """
+        Crawls the queued URLs and yields their results in completion order,
+        until none is left. URLs submitted meanwhile are crawled as well.
+        Closing the iterator early cancels the requests in flight and queues
+        their URLs again.
+        """
+        tasks: Dict[asyncio.Task, Tuple[str, Tuple[int, str, int]]] = {}
+        try:
+            while self._ring or tasks:
+                self._start_ready(time.monotonic(), tasks)
+                next_start = self._next_start()
+                timeout = None if next_start is None else max(0.0, next_start - time.monotonic())
+                if not tasks:
+                    await asyncio.sleep(timeout or 0.0)
+                    continue
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                now = time.monotonic()
+                for task in done:
+                    domain, item = tasks.pop(task)
+                    result = self._finish(domain, item, task, now)
+                    if result is not None:
+                        yield result
+        finally:
+            for task, (domain, item) in tasks.items():
+                task.cancel()
+                state = self._domains[domain]
+                state.in_flight -= 1
+                self._queue(domain, state, item, first=True)
+            await asyncio.gather(*tasks, return_exceptions=True)
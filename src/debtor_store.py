@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import pandas as pd
+from typing import Iterable, List, Optional
+
+from config import DEBTOR_CSV_PATH, ENRICHMENT_DB_PATH
+
+# Only the columns needed to build a search query are kept in memory.
+DEBTOR_SEARCH_COLUMNS = ['ID', 'LastName', 'CountryID', 'StateID']
+
+
+class DebtorStore:
+    """
+    An in-memory, ID-indexed view of the debtor data.
+
+    The source (Debtors.csv or the SQLite 'Debtors' table built by init_db)
+    is read once, on first access, and only the columns listed in `columns`
+    are kept. Lookups are then plain index accesses.
+    """
+
+    def __init__(self, csv_path: str = DEBTOR_CSV_PATH, db_path: Optional[str] = None,
+                 columns: Optional[List[str]] = None):
+        """
+        Args:
+            csv_path: Path to the Debtors.csv file.
+            db_path: Path to the SQLite database. When given and it has a
+                'Debtors' table, the table is used instead of the CSV file.
+            columns: Columns to keep. Defaults to DEBTOR_SEARCH_COLUMNS.
+        """
+        self.csv_path = csv_path
+        self.db_path = db_path
+        self.columns = columns or DEBTOR_SEARCH_COLUMNS
+        self._df: Optional[pd.DataFrame] = None
+
+    def _load_from_csv(self) -> pd.DataFrame:
+        return pd.read_csv(
+            self.csv_path,
+            usecols=lambda c: c in self.columns,
+            index_col='ID',
+        )
+
+    def _load_from_db(self) -> pd.DataFrame:
+        select_columns = ', '.join(f'"{c}"' for c in self.columns)
+        with sqlite3.connect(self.db_path) as conn:
+            df = pd.read_sql_query(f'SELECT {select_columns} FROM Debtors', conn, index_col='ID')
+        df.index = df.index.astype('int64')
+        return df
+
+    def _has_debtors_table(self) -> bool:
+        """Whether the database exists and has the 'Debtors' table; other modules share its file."""
+        if not self.db_path or not os.path.exists(self.db_path):
+            return False
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Debtors'"
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    def load(self) -> pd.DataFrame:
+        """Loads the debtor data if not already loaded and returns it."""
+        if self._df is not None:
+            return self._df
+
+        if self._has_debtors_table():
+            df = self._load_from_db()
+        else:
+            df = self._load_from_csv()
+
+        # Keep the first occurrence of duplicated IDs so .loc always returns a row.
+        self._df = df[~df.index.duplicated(keep='first')]
+        print(f"Loaded {len(self._df)} debtors into the debtor store.")
+        return self._df
+
+    def get(self, debtor_id: int) -> Optional[pd.Series]:
+        """Returns the debtor row for an ID, or None if it does not exist."""
+        df = self.load()
+        if debtor_id not in df.index:
+            return None
+        return df.loc[debtor_id]
+
+    def get_many(self, debtor_ids: Iterable[int]) -> pd.DataFrame:
+        """
+        Returns the rows for many debtor IDs at once.
+        Unknown IDs are silently dropped from the result.
+        """
+        df = self.load()
+        ids = pd.Index(list(debtor_ids)).unique()
+        return df.loc[ids.intersection(df.index, sort=False)]
+
+    def __contains__(self, debtor_id: int) -> bool:
+        return debtor_id in self.load().index
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    def clear(self):
+        """Drops the loaded data so the next access reloads it."""
+        self._df = None
+
+
+_debtor_store: Optional[DebtorStore] = None
+
+
+def get_debtor_store() -> DebtorStore:
+    """
+    Returns the process-wide debtor store.
+    The SQLite database is preferred when it has the 'Debtors' table, otherwise the CSV is used.
+    """
+    global _debtor_store
+    if _debtor_store is None:
+        _debtor_store = DebtorStore(db_path=ENRICHMENT_DB_PATH)
+    return _debtor_store
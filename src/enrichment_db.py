@@ -0,0 +1,104 @@
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from config import ENRICHMENT_DB_PATH
+from init_db import ENRICHMENT_CHILD_TABLES
+
+# EnrichmentData column holding the JSON list mirrored by each child table
+CHILD_TABLE_COLUMNS = {
+    'debtor_phone': 'extracted_phones',
+    'debtor_email': 'extracted_emails',
+    'debtor_address': 'extracted_addresses',
+    'debtor_url': 'relevant_urls',
+}
+
+
+def connect(db_path: str = ENRICHMENT_DB_PATH) -> sqlite3.Connection:
+    """Opens the enrichment database."""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def save_enrichment(conn: sqlite3.Connection, debtor_id: int, values: Dict[str, Iterable[str]],
+                    operational_status: Optional[str] = None, owners: Optional[Iterable[str]] = None,
+                    source: Optional[str] = None):
+    """
+    Saves the enrichment results of a debtor.
+
+    The EnrichmentData row keeps each list as JSON text, and every value is
+    also written to its child table (debtor_phone, debtor_email, ...) so it
+    can be indexed and joined.
+
+    Args:
+        conn: Connection to the enrichment database.
+        debtor_id: The ID of the debtor.
+        values: Mapping of child table name to the values found, e.g.
+            {'debtor_phone': {'(514) 794-5711'}}.
+        operational_status: 'Active', 'Likely Closed', ...
+        owners: Names of the owners found.
+        source: Where the values came from (e.g. 'serp', 'crawl').
+    """
+    unknown = set(values) - set(ENRICHMENT_CHILD_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown enrichment tables: {sorted(unknown)}")
+
+    values = {table_name: sorted(set(items)) for table_name, items in values.items()}
+    columns = {CHILD_TABLE_COLUMNS[table_name]: json.dumps(items, ensure_ascii=False)
+               for table_name, items in values.items()}
+    if operational_status is not None:
+        columns['operational_status'] = operational_status
+    if owners is not None:
+        columns['extracted_owners'] = json.dumps(sorted(set(owners)), ensure_ascii=False)
+
+    with conn:
+        row = conn.execute('SELECT id FROM EnrichmentData WHERE debtor_id = ?', (debtor_id,)).fetchone()
+        if row is None:
+            names = ', '.join(['debtor_id'] + list(columns))
+            placeholders = ', '.join(['?'] * (len(columns) + 1))
+            conn.execute(f'INSERT INTO EnrichmentData ({names}) VALUES ({placeholders})',
+                         (debtor_id, *columns.values()))
+        elif columns:
+            assignments = ', '.join(f'{name} = ?' for name in columns)
+            conn.execute(f'UPDATE EnrichmentData SET {assignments} WHERE id = ?', (*columns.values(), row[0]))
+
+        for table_name, items in values.items():
+            value_column = ENRICHMENT_CHILD_TABLES[table_name]
+            conn.execute(f'DELETE FROM {table_name} WHERE debtor_id = ?', (debtor_id,))
+            conn.executemany(
+                f'INSERT INTO {table_name} (debtor_id, {value_column}, source) VALUES (?, ?, ?)',
+                [(debtor_id, item, source) for item in items]
+            )
+
+
+def find_debtors_sharing(conn: sqlite3.Connection, table_name: str, value: str) -> List[int]:
+    """
+    Returns the IDs of all debtors with a given extracted value, e.g. every
+    debtor sharing a phone number. This is a seek on the (value, debtor_id) index.
+    """
+    if table_name not in ENRICHMENT_CHILD_TABLES:
+        raise ValueError(f"Unknown enrichment table '{table_name}'")
+    value_column = ENRICHMENT_CHILD_TABLES[table_name]
+    rows = conn.execute(
+        f'SELECT debtor_id FROM {table_name} WHERE {value_column} = ? ORDER BY debtor_id', (value,)
+    )
+    return [row[0] for row in rows]
+
+
+def find_shared_values(conn: sqlite3.Connection, table_name: str, min_debtors: int = 2) -> Dict[str, List[int]]:
+    """Returns every value found for at least min_debtors debtors, with those debtor IDs."""
+    if table_name not in ENRICHMENT_CHILD_TABLES:
+        raise ValueError(f"Unknown enrichment table '{table_name}'")
+    value_column = ENRICHMENT_CHILD_TABLES[table_name]
+    shared: Dict[str, List[int]] = {}
+    rows = conn.execute(f'''
+        SELECT {value_column}, debtor_id FROM {table_name}
+        WHERE {value_column} IN (
+            SELECT {value_column} FROM {table_name} GROUP BY {value_column} HAVING COUNT(*) >= ?
+        )
+        ORDER BY {value_column}, debtor_id
+    ''', (min_debtors,))
+    for value, debtor_id in rows:
+        shared.setdefault(value, []).append(debtor_id)
+    return shared
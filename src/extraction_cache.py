@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from config import EXTRACTION_CACHE_DB_PATH, EXTRACTION_CACHE_MAX_BYTES
+from ContactExtractor import EXTRACTOR_VERSION, ContactExtractor, StreamingContactExtractor, extract_batch
+from extraction_profiles import DEFAULT_COUNTRY_CODE, get_extraction_profile
+
+DEFAULT_REGION = DEFAULT_COUNTRY_CODE
+# Share of max_bytes written between two evictions
+EVICT_EVERY_FRACTION = 0.05
+# Cache lookups and writes committed at once by extract_many
+WRITE_BATCH_SIZE = 256
+
+
+def compute_content_hash(text: str) -> str:
+    """Returns the hash identifying a text in the extraction cache."""
+    return compute_chunks_hash((text,))
+
+
+def compute_chunks_hash(chunks: Iterable[str]) -> str:
+    """Returns the hash of the concatenation of text chunks, without concatenating them."""
+    content_hash = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        content_hash.update(chunk.encode('utf-8', errors='surrogatepass'))
+    return content_hash.hexdigest()
+
+
+def _encode_result(result: Dict[str, Set[str]]) -> str:
+    return json.dumps({kind: sorted(values) for kind, values in result.items()}, ensure_ascii=False)
+
+
+def _decode_result(payload: str) -> Dict[str, Set[str]]:
+    return {kind: set(values) for kind, values in json.loads(payload).items()}
+
+
+class ExtractionStats:
+    """Per-run counters of extraction cache hits and misses."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hit_ratio,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.hits} extraction cache hits, {self.misses} misses ({self.hit_ratio:.1%} hit ratio)"
+
+
+class ExtractionCache:
+    """
+    A persistent cache of `ContactExtractor.extract_all` results, in the
+    'ExtractionCache' table of its own database.
+
+    Results are keyed on (content hash, extractor version, region), where
+    region is the country code of the extraction profile, so an
+    unchanged text is never extracted twice, and bumping EXTRACTOR_VERSION
+    invalidates every result of the previous rules. Least recently used
+    results are evicted when the cache grows past max_bytes, checked each
+    time EVICT_EVERY_FRACTION of max_bytes has been written.
+    """
+
+    def __init__(self, db_path: str = EXTRACTION_CACHE_DB_PATH, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES,
+                 extractor_version: str = EXTRACTOR_VERSION):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.extractor_version = extractor_version
+        self.stats = ExtractionStats()
+        self._written_bytes = 0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS ExtractionCache (
+            content_hash TEXT NOT NULL,
+            extractor_version TEXT NOT NULL,
+            region TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (content_hash, extractor_version, region)
+        ) WITHOUT ROWID
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_ExtractionCache_LastAccess ON ExtractionCache (last_access)')
+        self.conn.commit()
+
+    def _get(self, content_hash: str, region: str, now: float) -> Optional[Dict[str, Set[str]]]:
+        row = self.conn.execute(
+            'UPDATE ExtractionCache SET last_access = ? '
+            'WHERE content_hash = ? AND extractor_version = ? AND region = ? RETURNING payload',
+            (now, content_hash, self.extractor_version, region)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return _decode_result(row[0])
+
+    def _put(self, content_hash: str, region: str, result: Dict[str, Set[str]], now: float):
+        payload = _encode_result(result)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO ExtractionCache '
+            '(content_hash, extractor_version, region, payload, size, created_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (content_hash, self.extractor_version, region, payload, len(payload), now, now)
+        )
+        self._written_bytes += len(payload)
+
+    def _evict_if_due(self):
+        if self._written_bytes >= self.max_bytes * EVICT_EVERY_FRACTION:
+            self.evict()
+
+    def get(self, text: str, region: str = DEFAULT_REGION) -> Optional[Dict[str, Set[str]]]:
+        """Returns the cached extraction result of a text, if any."""
+        with self.conn:
+            return self._get(compute_content_hash(text), region, time.time())
+
+    def put(self, text: str, result: Dict[str, Set[str]], region: str = DEFAULT_REGION):
+        """Stores the extraction result of a text."""
+        with self.conn:
+            self._put(compute_content_hash(text), region, result, time.time())
+        self._evict_if_due()
+
+    def extract_all(self, text: str, region: str = DEFAULT_REGION) -> Dict[str, Set[str]]:
+        """`ContactExtractor.extract_all` of a text, computed only on a cache miss."""
+        result = self.get(text, region)
+        if result is None:
+            result = ContactExtractor(text, get_extraction_profile(region)).extract_all()
+            self.put(text, result, region)
+        return result
+
+    def extract_chunks(self, chunks: Sequence[str], region: str = DEFAULT_REGION) -> Dict[str, Set[str]]:
+        """
+        Same as extract_all for the concatenation of chunks (e.g. the snippets
+        of a search), which is hashed and, on a miss, extracted chunk by chunk.
+        """
+        content_hash = compute_chunks_hash(chunks)
+        with self.conn:
+            result = self._get(content_hash, region, time.time())
+        if result is None:
+            extractor = StreamingContactExtractor(profile=get_extraction_profile(region))
+            for chunk in chunks:
+                extractor.feed(chunk)
+            extractor.close()
+            result = extractor.results()
+            with self.conn:
+                self._put(content_hash, region, result, time.time())
+            self._evict_if_due()
+        return result
+
+    def extract_many(self, items: Iterable[Tuple[Hashable, str]], region: str = DEFAULT_REGION,
+                     max_workers: Optional[int] = None,
+                     chunk_size: int = 32) -> Iterator[Tuple[Hashable, Dict[str, Set[str]]]]:
+        """
+        Cached version of `ContactExtractor.extract_batch`.
+
+        The items are read lazily: each text is looked up as the worker
+        processes ask for more input, and only the misses are sent to them.
+        Lookups and stored results are committed every WRITE_BATCH_SIZE
+        operations.
+
+        Yields:
+            (key, result) pairs, the hits as soon as they are looked up.
+        """
+        now = time.time()
+        hashes: Dict[Hashable, str] = {}
+        hits: Deque[Tuple[Hashable, Dict[str, Set[str]]]] = deque()
+        uncommitted = 0
+
+        def iter_misses() -> Iterator[Tuple[Hashable, str]]:
+            nonlocal uncommitted
+            for key, text in items:
+                content_hash = compute_content_hash(text)
+                result = self._get(content_hash, region, now)
+                uncommitted += 1
+                if result is None:
+                    hashes[key] = content_hash
+                    yield key, text
+                else:
+                    hits.append((key, result))
+
+        try:
+            for key, result in extract_batch(iter_misses(), max_workers=max_workers, chunk_size=chunk_size,
+                                             country_code=region):
+                while hits:
+                    yield hits.popleft()
+                self._put(hashes.pop(key), region, result, now)
+                uncommitted += 1
+                if uncommitted >= WRITE_BATCH_SIZE:
+                    self.conn.commit()
+                    uncommitted = 0
+                yield key, result
+            while hits:
+                yield hits.popleft()
+        finally:
+            self.conn.commit()
+        self._evict_if_due()
+
+    def evict(self) -> int:
+        """
+        Removes the results of other extractor versions, then least recently
+        used results until the cache fits in max_bytes.
+
+        Returns:
+            The number of results removed.
+        """
+        self._written_bytes = 0
+        with self.conn:
+            removed = self.conn.execute(
+                'DELETE FROM ExtractionCache WHERE extractor_version != ?', (self.extractor_version,)
+            ).rowcount
+
+            total_size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM ExtractionCache').fetchone()[0]
+            excess_size = total_size - self.max_bytes
+            if excess_size > 0:
+                to_delete = []
+                rows = self.conn.execute(
+                    'SELECT content_hash, extractor_version, region, size FROM ExtractionCache ORDER BY last_access'
+                )
+                for content_hash, extractor_version, region, size in rows:
+                    if excess_size <= 0:
+                        break
+                    to_delete.append((content_hash, extractor_version, region))
+                    excess_size -= size
+                self.conn.executemany(
+                    'DELETE FROM ExtractionCache WHERE content_hash = ? AND extractor_version = ? AND region = ?',
+                    to_delete
+                )
+                removed += len(to_delete)
+
+        if removed:
+            print(f"Evicted {removed} results from the extraction cache.")
+        return removed
+
+    def close(self):
+        self.conn.close()
+
+
+_extraction_cache: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """Returns the process-wide extraction cache."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache()
+    return _extraction_cache
@@ -0,0 +1,69 @@
+import sqlite3
+from functools import lru_cache
+
+import pandas as pd
+
+from address_extractor import AddressGrammar, get_address_grammar
+from config import COUNTRY_CONFIG
+from debtor_store import get_debtor_store
+
+DEFAULT_COUNTRY_CODE = 'CA'
+# Errors of the debtor store that leave every debtor with the default profile
+DEBTOR_DATA_ERRORS = (OSError, ValueError, sqlite3.Error, pd.errors.DatabaseError)
+
+# Set once the debtor data failed to load, so it is not read again for every debtor
+_debtor_data_error = None
+
+
+class ExtractionProfile:
+    """
+    The extraction settings for the debtors of one country of COUNTRY_CONFIG:
+    the region used to parse phone numbers, and the address grammar with its
+    anchors and street-type gazetteers.
+    """
+
+    def __init__(self, country_code: str):
+        self.country_code = country_code
+        self.phone_region = country_code
+        self.address_grammar: AddressGrammar = get_address_grammar(country_code)
+
+    def __repr__(self) -> str:
+        return f"ExtractionProfile('{self.country_code}')"
+
+
+@lru_cache(maxsize=None)
+def get_extraction_profile(country_code: str = DEFAULT_COUNTRY_CODE) -> ExtractionProfile:
+    """Returns the profile of a country code ('CA' or 'US'); compiled once per process."""
+    known_codes = {country['code'] for country in COUNTRY_CONFIG.values()}
+    if country_code not in known_codes:
+        raise ValueError(f"Unknown country code '{country_code}'")
+    return ExtractionProfile(country_code)
+
+
+def get_profile_for_country_id(country_id) -> ExtractionProfile:
+    """Returns the profile of a COUNTRY_CONFIG ID, or the default profile for an unknown ID."""
+    try:
+        country = COUNTRY_CONFIG.get(int(country_id))
+    except (TypeError, ValueError):
+        country = None
+    return get_extraction_profile(country['code'] if country else DEFAULT_COUNTRY_CODE)
+
+
+def get_profile_for_debtor(debtor_id: int) -> ExtractionProfile:
+    """
+    Returns the profile selected by the CountryID of a debtor in the debtor
+    store. When the debtor data cannot be loaded, the default profile is used
+    for every debtor and the warning is printed once.
+    """
+    global _debtor_data_error
+    if _debtor_data_error is not None:
+        return get_extraction_profile(DEFAULT_COUNTRY_CODE)
+    try:
+        debtor_info = get_debtor_store().get(debtor_id)
+    except DEBTOR_DATA_ERRORS as e:
+        _debtor_data_error = e
+        print(f"Warning: Debtor data could not be loaded ({e}), using the {DEFAULT_COUNTRY_CODE} profile.")
+        debtor_info = None
+    if debtor_info is None:
+        return get_extraction_profile(DEFAULT_COUNTRY_CODE)
+    return get_profile_for_country_id(debtor_info.get('CountryID'))
@@ -1,14 +1,19 @@
 import os
 import json
+import sqlite3
 import pandas as pd
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional
 from dotenv import load_dotenv
 from serpapi import GoogleSearch
 from utils import load_json_file
+from debtor_store import get_debtor_store
+from serp_cache import get_serp_cache, is_cacheable
+from serp_store import get_serp_store
 
 from config import (
     DEBTOR_CSV_PATH,
     SERP_PREVIOUS_SEARCHES_PATH,
+    SERP_SAVE_JSON_FILES,
     COUNTRY_CONFIG,
     STATES_BY_ID
 )
@@ -17,14 +22,57 @@ load_dotenv()
 
 SERP_API_KEY = os.getenv('SERP_API_KEY')
 
+# Cache modes for google_search
+CACHE_ONLY = 'cache_only'
+REFRESH = 'refresh'
+READ_THROUGH = 'read_through'
+CACHE_MODES = {CACHE_ONLY, REFRESH, READ_THROUGH}
+
+
+class SearchStats:
+    """
+    Per-run counters of cache hits, cache misses, forced refreshes (which
+    skip the cache, so are neither hits nor misses) and paid SerpApi calls.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.paid_calls = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.paid_calls = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'paid_calls': self.paid_calls,
+            'hit_ratio': self.hit_ratio,
+        }
+
+    def __str__(self) -> str:
+        return (f"{self.hits} cache hits, {self.misses} misses "
+                f"({self.hit_ratio:.1%} hit ratio), {self.refreshes} refreshes, {self.paid_calls} paid calls")
+
+
+search_stats = SearchStats()
+
 
 def load_current_debtor_info(debtor_id: int) -> Optional[pd.Series]:
-    """Load debtor information from CSV file by ID."""
+    """Load debtor information by ID from the process-wide debtor store."""
     try:
-        df = pd.read_csv(DEBTOR_CSV_PATH, index_col='ID')
-        if debtor_id not in df.index:
-            return None
-        return df.loc[debtor_id]
+        return get_debtor_store().get(debtor_id)
     except FileNotFoundError:
         print(f"Error: Debtor CSV file not found at {DEBTOR_CSV_PATH}")
         return None
@@ -40,12 +88,39 @@ def build_search_params(debtor_id: int) -> Optional[Dict]:
     if current_debtor_info is None:
         return None
 
+    return build_search_params_from_info(current_debtor_info)
+
+
+def build_search_params_batch(debtor_ids: Iterable[int]) -> Dict[int, Dict]:
+    """
+    Build search parameters for many debtors with a single store lookup.
+    Debtors that are unknown or cannot be searched are left out of the result.
+    """
+    try:
+        debtors = get_debtor_store().get_many(debtor_ids)
+    except FileNotFoundError:
+        print(f"Error: Debtor CSV file not found at {DEBTOR_CSV_PATH}")
+        return {}
+    except Exception as e:
+        print(f"Error loading debtor info: {e}")
+        return {}
+
+    params_by_id = {}
+    for debtor_id, debtor_info in debtors.iterrows():
+        params = build_search_params_from_info(debtor_info)
+        if params:
+            params_by_id[int(debtor_id)] = params
+    return params_by_id
+
+
+def build_search_params_from_info(current_debtor_info: pd.Series) -> Optional[Dict]:
+    """Build search parameters from an already loaded debtor row."""
     # Validate required fields
     try:
         country_id = int(current_debtor_info['CountryID'])
         state_id = int(current_debtor_info['StateID'])
         last_name = str(current_debtor_info['LastName']).strip()
-    except (ValueError, KeyError):
+    except (ValueError, TypeError, KeyError):
         return None
 
     # Check if country is supported and last name is valid
@@ -75,7 +150,19 @@ def build_search_params(debtor_id: int) -> Optional[Dict]:
     return params
 
 def save_search_results(debtor_id: int, search_results: Dict) -> bool:
-    """Save search results to JSON file."""
+    """
+    Save search results to the SERP store.
+    A compact JSON file per debtor is also written when SERP_SAVE_JSON_FILES is set.
+    """
+    try:
+        get_serp_store().save(debtor_id, search_results)
+    except sqlite3.Error as e:
+        print(f"Error saving search results for debtor {debtor_id}: {e}")
+        return False
+
+    if not SERP_SAVE_JSON_FILES:
+        return True
+
     json_file = os.path.join(SERP_PREVIOUS_SEARCHES_PATH, f'{debtor_id}.json')
 
     # Ensure directory exists
@@ -83,15 +170,19 @@ def save_search_results(debtor_id: int, search_results: Dict) -> bool:
 
     try:
         with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(search_results, f, indent=2, ensure_ascii=False)
+            json.dump(search_results, f, separators=(',', ':'), ensure_ascii=False)
         return True
     except IOError as e:
         print(f"Error saving search results for debtor {debtor_id}: {e}")
         return False
 
 
-def perform_google_search(debtor_id: int) -> Optional[Dict]:
-    """Perform Google search for debtor information."""
+def perform_google_search(debtor_id: int, use_cache: bool = True) -> Optional[Dict]:
+    """
+    Perform Google search for debtor information.
+    When use_cache is True, a cached search with the same parameters is reused
+    instead of paying for a new one.
+    """
     if not SERP_API_KEY:
         print("Error: SERP_API_KEY not found in environment variables")
         return None
@@ -102,8 +193,20 @@ def perform_google_search(debtor_id: int) -> Optional[Dict]:
         return None
 
     try:
-        search = GoogleSearch(params)
-        search_results = search.get_dict()
+        # Debtors with the same normalized search parameters share one paid search
+        serp_cache = get_serp_cache()
+        search_results = serp_cache.get(params) if use_cache else None
+        if search_results is None:
+            if use_cache:
+                search_stats.misses += 1
+            search_stats.paid_calls += 1
+            search = GoogleSearch(params)
+            search_results = search.get_dict()
+            if is_cacheable(search_results):
+                serp_cache.put(params, search_results, debtor_id=debtor_id)
+        else:
+            search_stats.hits += 1
+            serp_cache.link(debtor_id, params)
         save_search_results(debtor_id, search_results)
 
         if not search_results or 'organic_results' not in search_results:
@@ -116,18 +219,59 @@ def perform_google_search(debtor_id: int) -> Optional[Dict]:
         return None
 
 
-def google_search(debtor_id: int) -> Optional[Dict]:
+def load_cached_search(debtor_id: int) -> Optional[Dict]:
+    """
+    Returns the cached search results for a debtor without performing a search.
+    The debtor's own saved search is used first, then a cached search with the
+    same parameters made for another debtor.
+    """
+    previous_search = get_serp_store().load(debtor_id)
+    if previous_search is None:
+        # Searches saved before the SERP store existed
+        json_file = os.path.join(SERP_PREVIOUS_SEARCHES_PATH, f'{debtor_id}.json')
+        previous_search = load_json_file(json_file)
+    if previous_search and ('organic_results' in previous_search or is_cacheable(previous_search)):
+        return previous_search
+
+    params = build_search_params(debtor_id)
+    if not params:
+        return None
+
+    search_results = get_serp_cache().get(params)
+    if search_results is not None:
+        get_serp_cache().link(debtor_id, params)
+        save_search_results(debtor_id, search_results)
+    return search_results
+
+
+def google_search(debtor_id: int, cache_mode: str = READ_THROUGH) -> Optional[Dict]:
     """
     Main function to get Google search results for a debtor.
-    Returns cached results if available, otherwise performs new search.
+
+    Args:
+        debtor_id: The ID of the debtor to search for.
+        cache_mode: 'read_through' returns cached results if available, otherwise
+            performs a new search. 'cache_only' never performs a search.
+            'refresh' always performs a new search and updates the cache.
+
+    Returns:
+        The organic results, or None if there are none.
     """
-    json_file = os.path.join(SERP_PREVIOUS_SEARCHES_PATH, f'{debtor_id}.json')
-    previous_search = load_json_file(json_file)
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache mode '{cache_mode}', expected one of {sorted(CACHE_MODES)}")
 
-    if previous_search and 'organic_results' in previous_search:
-        print(previous_search['organic_results'])
-        return previous_search['organic_results']
+    if cache_mode == REFRESH:
+        search_stats.refreshes += 1
+        return perform_google_search(debtor_id, use_cache=False)
+
+    previous_search = load_cached_search(debtor_id)
+    if previous_search is not None:
+        search_stats.hits += 1
+        return previous_search.get('organic_results')
+
+    search_stats.misses += 1
+    if cache_mode == CACHE_ONLY:
+        return None
 
-    return previous_search
     # Perform new search
-    return perform_google_search(debtor_id)
\ No newline at end of file
+    return perform_google_search(debtor_id, use_cache=False)
@@ -1,10 +1,25 @@
 import sqlite3
 import os
+import re
 import csv
+import time
+import hashlib
+import argparse
 
 # Increase CSV field size limit to max
 csv.field_size_limit(2147483647)
 
+INTEGER_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]*)')
+REAL_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?')
+
+# Child tables holding one extracted value per row, keyed like (debtor_id, value)
+ENRICHMENT_CHILD_TABLES = {
+    'debtor_phone': 'phone',
+    'debtor_email': 'email',
+    'debtor_address': 'address',
+    'debtor_url': 'url',
+}
+
 def get_csv_headers(csv_path):
     """Reads the first line of a CSV file and returns the headers."""
     with open(csv_path, 'r', encoding='utf-8') as f:
@@ -15,20 +30,51 @@ def sanitize_name(name):
     """Sanitizes a column name for SQL by quoting it."""
     return f'"{name.replace('"', '""')}"'
 
-def create_table_from_csv_headers(cursor, table_name, headers, foreign_keys=None):
+def infer_column_types(csv_path, sample_size=50000):
+    """
+    Guesses the SQLite type of each CSV column from its first sample_size rows.
+    A column is INTEGER or REAL when every non-empty sampled value is, and TEXT otherwise.
+    Numbers with leading zeros (postal codes, account numbers) stay TEXT.
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        candidates = [{'INTEGER', 'REAL'} for _ in headers]
+
+        for i, row in enumerate(reader):
+            if i >= sample_size:
+                break
+            if len(row) != len(headers):
+                continue
+            for column, value in enumerate(row):
+                if not value or not candidates[column]:
+                    continue
+                if not INTEGER_PATTERN.fullmatch(value) or len(value) > 18:
+                    candidates[column].discard('INTEGER')
+                if not REAL_PATTERN.fullmatch(value):
+                    candidates[column].discard('REAL')
+
+    column_types = {}
+    for header, types in zip(headers, candidates):
+        column_types[header] = 'INTEGER' if 'INTEGER' in types else 'REAL' if 'REAL' in types else 'TEXT'
+    return column_types
+
+def create_table_from_csv_headers(cursor, table_name, headers, foreign_keys=None, column_types=None):
     """
     Generates and executes a CREATE TABLE statement from a list of headers.
-    - All columns are created as TEXT, except for 'ID'.
+    - All columns are created as TEXT, except for 'ID', unless column_types gives their type.
     - 'ID' is assumed to be the INTEGER PRIMARY KEY.
     - foreign_keys is a list of strings like 'FOREIGN KEY (Column) REFERENCES OtherTable(OtherColumn)'
+    - column_types is a mapping of header to SQLite type, as returned by infer_column_types
     """
+    column_types = column_types or {}
     column_definitions = []
     for header in headers:
         sanitized = sanitize_name(header)
         if header.upper() == 'ID':
             column_definitions.append(f'{sanitized} INTEGER PRIMARY KEY')
         else:
-            column_definitions.append(f'{sanitized} TEXT')
+            column_definitions.append(f'{sanitized} {column_types.get(header, "TEXT")}')
     
     if foreign_keys:
         column_definitions.extend(foreign_keys)
@@ -38,34 +84,394 @@ def create_table_from_csv_headers(cursor, table_name, headers, foreign_keys=None
     cursor.execute(create_sql)
     print(f"Table '{table_name}' created successfully.")
 
-def populate_table_from_csv(conn, cursor, table_name, csv_path):
-    """Populates a table from a CSV file, skipping the header."""
+def get_typed_column_indexes(cursor, table_name, headers, key_column=None):
+    """
+    Returns the positions in headers of the non-TEXT columns of a table, whose
+    empty CSV values must be stored as NULL rather than as an empty string.
+    """
+    declared_types = {row[1]: row[2].upper() for row in cursor.execute(f'PRAGMA table_info({sanitize_name(table_name)})')}
+    return [
+        i for i, header in enumerate(headers)
+        if header != key_column and header.upper() != 'ID' and declared_types.get(header, 'TEXT') != 'TEXT'
+    ]
+
+def _null_empty_values(row, typed_indexes):
+    if not typed_indexes:
+        return row
+    row = list(row)
+    for i in typed_indexes:
+        if row[i] == '':
+            row[i] = None
+    return row
+
+def apply_bulk_load_pragmas(cursor):
+    """
+    Tunes the connection for a one-off bulk load.
+    The rollback journal is kept in memory and fsyncs are skipped, so a crash
+    during the load leaves an unusable database that must be rebuilt.
+    """
+    cursor.execute('PRAGMA journal_mode = MEMORY')
+    cursor.execute('PRAGMA synchronous = OFF')
+    cursor.execute('PRAGMA cache_size = -262144')  # 256 MiB
+    cursor.execute('PRAGMA temp_store = MEMORY')
+
+
+def restore_default_pragmas(cursor):
+    """Restores durable settings once the bulk load is done."""
+    cursor.execute('PRAGMA journal_mode = WAL')
+    cursor.execute('PRAGMA synchronous = NORMAL')
+
+
+def compute_row_hash(row):
+    """Returns a content hash of a CSV row, used to detect changed rows."""
+    return hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get_sync_key_column(headers):
+    """Returns the column identifying a row across imports: 'ID', or 'Number' when there is no ID."""
+    for candidate in ('ID', 'Number'):
+        if candidate in headers:
+            return candidate
+    raise ValueError(f"No 'ID' or 'Number' column in headers {headers}")
+
+
+def create_row_hash_table(cursor):
+    """Creates the table holding the content hash of every imported CSV row."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS RowHashes (
+        table_name TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        row_hash TEXT NOT NULL,
+        PRIMARY KEY (table_name, row_key)
+    ) WITHOUT ROWID
+    ''')
+
+
+def _begin(conn, cursor):
+    """
+    Opens the transaction of a whole load. Without it, the savepoint of the
+    first batch would start a transaction that its RELEASE commits, since
+    the sqlite3 module only opens transactions implicitly before DML.
+    """
+    if not conn.in_transaction:
+        cursor.execute('BEGIN')
+
+
+def _insert_batch(cursor, insert_sql, batch, csv_name):
+    """
+    Inserts a batch of (row_number, row) with executemany, falling back to row by row on error.
+    Returns the set of row numbers that could not be inserted.
+    """
+    # The savepoint, nested in the transaction of the load, undoes the rows
+    # executemany inserted before a failing one
+    cursor.execute('SAVEPOINT insert_batch')
+    try:
+        cursor.executemany(insert_sql, [row for _, row in batch])
+        cursor.execute('RELEASE insert_batch')
+        return set()
+    except sqlite3.Error:
+        cursor.execute('ROLLBACK TO insert_batch')
+        cursor.execute('RELEASE insert_batch')
+        failed = set()
+        for row_number, row in batch:
+            try:
+                cursor.execute(insert_sql, row)
+            except sqlite3.Error as e:
+                print(f"Error inserting row {row_number} from {csv_name}: {e}")
+                failed.add(row_number)
+        return failed
+
+
+def _save_row_hashes(cursor, table_name, batch, hashes, failed):
+    cursor.executemany(
+        'INSERT OR REPLACE INTO RowHashes (table_name, row_key, row_hash) VALUES (?, ?, ?)',
+        [(table_name, *hashes[row_number]) for row_number, _ in batch if row_number not in failed]
+    )
+
+
+def populate_table_from_csv(conn, cursor, table_name, csv_path, batch_size=10000, key_column=None):
+    """
+    Populates a table from a CSV file, skipping the header.
+    Rows are inserted in batches of batch_size with executemany inside a single transaction,
+    opened explicitly before the first batch and committed at the end.
+    When key_column is given, the content hash of each row is recorded in 'RowHashes'
+    so later syncs only touch changed rows.
+    """
+    csv_name = os.path.basename(csv_path)
+    start_time = time.perf_counter()
+    inserted = 0
+
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.reader(f)
-        headers = [sanitize_name(h) for h in next(reader)]
-        
+        raw_headers = next(reader)
+        headers = [sanitize_name(h) for h in raw_headers]
+        key_index = raw_headers.index(key_column) if key_column else None
+        typed_indexes = get_typed_column_indexes(cursor, table_name, raw_headers, key_column)
+        placeholders = ', '.join(['?'] * len(headers))
+        insert_sql = f"INSERT INTO {sanitize_name(table_name)} ({', '.join(headers)}) VALUES ({placeholders})"
+
+        batch = []
+        hashes = {}
+        _begin(conn, cursor)
+
+        def flush():
+            failed = _insert_batch(cursor, insert_sql, batch, csv_name)
+            if key_column:
+                _save_row_hashes(cursor, table_name, batch, hashes, failed)
+            hashes.clear()
+            return len(batch) - len(failed)
+
         for i, row in enumerate(reader, 1):
             if not row:
-                print(f"Warning: Skipping empty row {i+1} in {os.path.basename(csv_path)}")
+                print(f"Warning: Skipping empty row {i+1} in {csv_name}")
                 continue
             if len(row) != len(headers):
-                print(f"Error: Row {i+1} in {os.path.basename(csv_path)} has {len(row)} values, but {len(headers)} were expected. Skipping row.")
+                print(f"Error: Row {i+1} in {csv_name} has {len(row)} values, but {len(headers)} were expected. Skipping row.")
                 continue
 
-            placeholders = ', '.join(['?'] * len(headers))
-            insert_sql = f"INSERT INTO {sanitize_name(table_name)} ({', '.join(headers)}) VALUES ({placeholders})"
-            
-            try:
-                cursor.execute(insert_sql, row)
-            except sqlite3.Error as e:
-                print(f"Error inserting row {i+1} from {os.path.basename(csv_path)}: {e}")
+            batch.append((i + 1, _null_empty_values(row, typed_indexes)))
+            if key_column:
+                hashes[i + 1] = (row[key_index], compute_row_hash(row))
+            if len(batch) >= batch_size:
+                inserted += flush()
+                batch = []
+
+        if batch:
+            inserted += flush()
+
+    conn.commit()
+    duration = time.perf_counter() - start_time
+    rate = inserted / duration if duration > 0 else float(inserted)
+    print(f"Table '{table_name}' populated from {csv_name}: {inserted} rows in {duration:.1f}s ({rate:,.0f} rows/s).")
+
+
+def sync_table_from_csv(conn, cursor, table_name, csv_path, key_column, delete_missing=False, batch_size=10000):
+    """
+    Brings a table up to date with a CSV file by upserting only new or changed rows.
+
+    Each row is compared by key_column against the content hash stored in
+    'RowHashes'. Unchanged rows are not written. Rows that are no longer in
+    the CSV are deleted only when delete_missing is True. The whole sync
+    runs in one transaction.
+    """
+    csv_name = os.path.basename(csv_path)
+    start_time = time.perf_counter()
+    existing_hashes = dict(cursor.execute(
+        'SELECT row_key, row_hash FROM RowHashes WHERE table_name = ?', (table_name,)
+    ))
+    seen_keys = set()
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'deleted': 0}
 
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        raw_headers = next(reader)
+        headers = [sanitize_name(h) for h in raw_headers]
+        key_index = raw_headers.index(key_column)
+        typed_indexes = get_typed_column_indexes(cursor, table_name, raw_headers, key_column)
+        placeholders = ', '.join(['?'] * len(headers))
+        updates = ', '.join(f'{h} = excluded.{h}' for h in headers if h != sanitize_name(key_column))
+        upsert_sql = (
+            f"INSERT INTO {sanitize_name(table_name)} ({', '.join(headers)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({sanitize_name(key_column)}) DO UPDATE SET {updates}"
+        )
+
+        batch = []
+        hashes = {}
+        _begin(conn, cursor)
+
+        def flush():
+            failed = _insert_batch(cursor, upsert_sql, batch, csv_name)
+            _save_row_hashes(cursor, table_name, batch, hashes, failed)
+            hashes.clear()
+            counts['failed'] += len(failed)
+
+        for i, row in enumerate(reader, 1):
+            if not row:
+                print(f"Warning: Skipping empty row {i+1} in {csv_name}")
+                continue
+            if len(row) != len(headers):
+                print(f"Error: Row {i+1} in {csv_name} has {len(row)} values, but {len(headers)} were expected. Skipping row.")
+                continue
+
+            key = row[key_index]
+            seen_keys.add(key)
+            row_hash = compute_row_hash(row)
+            previous_hash = existing_hashes.get(key)
+            if previous_hash == row_hash:
+                counts['unchanged'] += 1
+                continue
+
+            counts['inserted' if previous_hash is None else 'updated'] += 1
+            batch.append((i + 1, _null_empty_values(row, typed_indexes)))
+            hashes[i + 1] = (key, row_hash)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+
+        if batch:
+            flush()
+
+    missing_keys = [(key,) for key in existing_hashes if key not in seen_keys]
+    if missing_keys and delete_missing:
+        cursor.executemany(
+            f"DELETE FROM {sanitize_name(table_name)} WHERE {sanitize_name(key_column)} = ?", missing_keys
+        )
+        cursor.executemany(
+            'DELETE FROM RowHashes WHERE table_name = ? AND row_key = ?',
+            [(table_name, key) for key, in missing_keys]
+        )
+        counts['deleted'] = len(missing_keys)
+    elif missing_keys:
+        print(f"Warning: {len(missing_keys)} rows of '{table_name}' are no longer in {csv_name} and were kept.")
+
+    conn.commit()
+    duration = time.perf_counter() - start_time
+    written = counts['inserted'] + counts['updated'] - counts['failed']
+    rate = written / duration if duration > 0 else float(written)
+    print(f"Table '{table_name}' synced from {csv_name} in {duration:.1f}s ({rate:,.0f} rows/s written): "
+          f"{counts['inserted']} new, {counts['updated']} changed, {counts['unchanged']} unchanged, "
+          f"{counts['failed']} failed, {counts['deleted']} deleted.")
+    return counts
+
+
+def create_enrichment_child_tables(cursor):
+    """
+    Creates one table per kind of extracted value (phone, email, address, url),
+    with a row per (debtor_id, value). The reverse (value, debtor_id) index covers
+    lookups such as "all debtors sharing this phone number".
+    """
+    for table_name, value_column in ENRICHMENT_CHILD_TABLES.items():
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            debtor_id INTEGER NOT NULL,
+            {value_column} TEXT NOT NULL,
+            source TEXT,
+            PRIMARY KEY (debtor_id, {value_column}),
+            FOREIGN KEY (debtor_id) REFERENCES Debtors(ID)
+        ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS IX_{table_name}_{value_column} ON {table_name} ({value_column}, debtor_id)')
+    print(f"Tables {', '.join(ENRICHMENT_CHILD_TABLES)} created.")
+
+def create_tables(cursor, debtors_headers, files_headers, debtors_types=None, files_types=None):
+    """
+    Creates the Debtors, Files, EnrichmentData, enrichment child and RowHashes tables if they do not exist.
+    debtors_types and files_types give the column types of the CSV tables (all TEXT when omitted).
+    """
+    create_table_from_csv_headers(cursor, 'Debtors', debtors_headers, column_types=debtors_types)
+
+    files_foreign_keys = [
+        'FOREIGN KEY (DebtorID) REFERENCES Debtors(ID)'
+    ]
+    create_table_from_csv_headers(cursor, 'Files', files_headers, foreign_keys=files_foreign_keys,
+                                  column_types=files_types)
+
+    # --- Create EnrichmentData table ---
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS EnrichmentData (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        debtor_id INTEGER,
+        operational_status TEXT,
+        extracted_owners TEXT,
+        extracted_phones TEXT,
+        extracted_emails TEXT,
+        extracted_addresses TEXT,
+        relevant_urls TEXT,
+        FOREIGN KEY (debtor_id) REFERENCES Debtors(ID)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_EnrichmentData_Debtor ON EnrichmentData (debtor_id)')
+    print("Table 'EnrichmentData' created.")
+
+    create_enrichment_child_tables(cursor)
+    create_row_hash_table(cursor)
+
+
+def create_indexes(cursor):
+    """Creates the indexes of the Debtors and Files tables if they do not exist."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_FirsNameLastNameNumber ON Debtors (FirstName, LastName, Number)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_FirsNameLastName ON Debtors (FirstName, LastName)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS IX_Debtors_Number ON Debtors (Number)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_CityID ON Debtors (CityID)')
+
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS IX_Files_Number ON Files (Number)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Customer ON Files (CustomerID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Debtor ON Files (DebtorID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_FileState ON Files (FileStateID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Manager ON Files (ManagerID)')
+
+
+def rebuild_database(conn, cursor, debtors_csv_path, files_csv_path, typed_schema=False):
+    """
+    Drops every table, including EnrichmentData, and reloads Debtors and Files from the CSV files.
+    With typed_schema, numeric CSV columns get INTEGER or REAL affinity instead of TEXT.
+    """
+    # --- Drop existing tables (for good measure) ---
+    cursor.execute('DROP TABLE IF EXISTS Files')
+    cursor.execute('DROP TABLE IF EXISTS EnrichmentData')
+    for table_name in ENRICHMENT_CHILD_TABLES:
+        cursor.execute(f'DROP TABLE IF EXISTS {table_name}')
+    cursor.execute('DROP TABLE IF EXISTS Debtors')
+    cursor.execute('DROP TABLE IF EXISTS RowHashes')
+    print("Dropped existing tables.")
+
+    # --- Create tables from CSV headers ---
+    print("Creating tables...")
+    debtors_headers = get_csv_headers(debtors_csv_path)
+    files_headers = get_csv_headers(files_csv_path)
+    debtors_types = infer_column_types(debtors_csv_path) if typed_schema else None
+    files_types = infer_column_types(files_csv_path) if typed_schema else None
+    create_tables(cursor, debtors_headers, files_headers, debtors_types, files_types)
+
+    # --- Populate tables ---
+    print("Populating tables...")
+    apply_bulk_load_pragmas(cursor)
+    populate_table_from_csv(conn, cursor, 'Debtors', debtors_csv_path,
+                            key_column=get_sync_key_column(debtors_headers))
+    populate_table_from_csv(conn, cursor, 'Files', files_csv_path,
+                            key_column=get_sync_key_column(files_headers))
+
+    # --- Create indexes ---
+    print("Creating indexes...")
+    create_indexes(cursor)
     conn.commit()
-    print(f"Table '{table_name}' populated from {os.path.basename(csv_path)}.")
+    print("Indexes created successfully.")
+
+    cursor.execute('ANALYZE')
+    restore_default_pragmas(cursor)
 
 
-def main():
-    """Main function to initialize the database."""
+def sync_database(conn, cursor, debtors_csv_path, files_csv_path, delete_missing=False):
+    """
+    Upserts the new and changed rows of the CSV files into an existing database.
+    EnrichmentData and every other table are left untouched.
+    """
+    restore_default_pragmas(cursor)
+    cursor.execute('PRAGMA cache_size = -262144')  # 256 MiB
+
+    debtors_headers = get_csv_headers(debtors_csv_path)
+    files_headers = get_csv_headers(files_csv_path)
+    create_tables(cursor, debtors_headers, files_headers)
+    # Upserts on 'Number' need its unique index to exist
+    create_indexes(cursor)
+    conn.commit()
+
+    print("Syncing tables...")
+    sync_table_from_csv(conn, cursor, 'Debtors', debtors_csv_path,
+                        get_sync_key_column(debtors_headers), delete_missing=delete_missing)
+    sync_table_from_csv(conn, cursor, 'Files', files_csv_path,
+                        get_sync_key_column(files_headers), delete_missing=delete_missing)
+
+
+def main(sync=False, delete_missing=False, typed_schema=False):
+    """
+    Main function to initialize the database.
+
+    Args:
+        sync: Update the existing database incrementally instead of rebuilding it.
+        delete_missing: In sync mode, delete rows that are no longer in the CSV files.
+        typed_schema: When rebuilding, give numeric CSV columns INTEGER or REAL affinity.
+    """
     base_dir = os.path.dirname(__file__)
     db_path = os.path.join(base_dir, '..', 'data', 'enrichment.sqlite')
     debtors_csv_path = os.path.join(base_dir, '..', 'data', 'Debtors.csv')
@@ -79,7 +485,11 @@ def main():
         return
 
     # --- Database setup ---
-    if os.path.exists(db_path):
+    if sync and not os.path.exists(db_path):
+        print(f"No database at {db_path}, building it from scratch.")
+        sync = False
+
+    if not sync and os.path.exists(db_path):
         os.remove(db_path)
         print(f"Removed existing database at {db_path}")
 
@@ -87,58 +497,10 @@ def main():
     cursor = conn.cursor()
 
     try:
-        # --- Drop existing tables (for good measure) ---
-        cursor.execute('DROP TABLE IF EXISTS Files')
-        cursor.execute('DROP TABLE IF EXISTS EnrichmentData')
-        cursor.execute('DROP TABLE IF EXISTS Debtors')
-        print("Dropped existing tables.")
-
-        # --- Create tables from CSV headers ---
-        print("Creating tables...")
-        debtors_headers = get_csv_headers(debtors_csv_path)
-        files_headers = get_csv_headers(files_csv_path)
-
-        create_table_from_csv_headers(cursor, 'Debtors', debtors_headers)
-        
-        files_foreign_keys = [
-            'FOREIGN KEY (DebtorID) REFERENCES Debtors(ID)'
-        ]
-        create_table_from_csv_headers(cursor, 'Files', files_headers, foreign_keys=files_foreign_keys)
-
-        # --- Create EnrichmentData table ---
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS EnrichmentData (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            debtor_id INTEGER,
-            operational_status TEXT,
-            extracted_owners TEXT,
-            extracted_phones TEXT,
-            extracted_emails TEXT,
-            extracted_addresses TEXT,
-            relevant_urls TEXT,
-            FOREIGN KEY (debtor_id) REFERENCES Debtors(ID)
-        )
-        ''')
-        print("Table 'EnrichmentData' created.")
-
-        # --- Populate tables ---
-        print("Populating tables...")
-        populate_table_from_csv(conn, cursor, 'Debtors', debtors_csv_path)
-        populate_table_from_csv(conn, cursor, 'Files', files_csv_path)
-
-        # --- Create indexes ---
-        print("Creating indexes...")
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_FirsNameLastNameNumber ON Debtors (FirstName, LastName, Number)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_FirsNameLastName ON Debtors (FirstName, LastName)')
-        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS IX_Debtors_Number ON Debtors (Number)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Debtors_CityID ON Debtors (CityID)')
-        
-        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS IX_Files_Number ON Files (Number)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Customer ON Files (CustomerID)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Debtor ON Files (DebtorID)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_FileState ON Files (FileStateID)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS IX_Files_Manager ON Files (ManagerID)')
-        print("Indexes created successfully.")
+        if sync:
+            sync_database(conn, cursor, debtors_csv_path, files_csv_path, delete_missing=delete_missing)
+        else:
+            rebuild_database(conn, cursor, debtors_csv_path, files_csv_path, typed_schema=typed_schema)
 
     except sqlite3.Error as e:
         print(f"A database error occurred: {e}")
@@ -151,4 +513,12 @@ def main():
         print(f"Database initialization complete. Database is at {db_path}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build or update the enrichment database from the CSV exports.")
+    parser.add_argument('--sync', action='store_true',
+                        help="Upsert only new or changed rows and keep EnrichmentData.")
+    parser.add_argument('--delete-missing', action='store_true',
+                        help="With --sync, delete rows that are no longer in the CSV files.")
+    parser.add_argument('--typed-schema', action='store_true',
+                        help="When rebuilding, infer INTEGER and REAL columns from the CSV data.")
+    args = parser.parse_args()
+    main(sync=args.sync, delete_missing=args.delete_missing, typed_schema=args.typed_schema)
@@ -1,7 +1,8 @@
-from fetch_debtor import google_search
+from fetch_debtor import google_search, search_stats
 # import pandas as pd
 
 if __name__ == "__main__":
     debtor_id = 303985
     search_results = google_search(debtor_id)
-    print(search_results)
\ No newline at end of file
+    print(search_results)
+    print(f"Search stats: {search_stats}")
\ No newline at end of file
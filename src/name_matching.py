@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+# Legal-form and generic company suffixes, French and English, in folded form
+LEGAL_SUFFIXES = {
+    # English
+    'inc', 'incorporated', 'ltd', 'limited', 'llc', 'llp', 'lp', 'corp', 'corporation',
+    'co', 'company', 'plc', 'group',
+    # French (Québec)
+    'ltee', 'limitee', 'incorporee', 'enr', 'enregistree', 'senc', 'sencrl', 'srl',
+    'cie', 'compagnie', 'sa', 'groupe',
+}
+
+# Tokens shorter than this must match exactly; n-gram similarity is meaningless for them
+MIN_FUZZY_TOKEN_LENGTH = 4
+DEFAULT_TOKEN_THRESHOLD = 0.75
+
+_DOTTED_ABBREVIATION = re.compile(r'(?<![a-z0-9])(?:[a-z]\.){2,}[a-z]?(?![a-z0-9])')
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+
+def fold(text: str) -> str:
+    """Lowercases text and strips accents: 'Rénovateur' -> 'renovateur'."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(name: str) -> Tuple[str, ...]:
+    """
+    Splits a company name or title into folded tokens.
+    Dotted abbreviations are joined first, so 'S.E.N.C.' becomes 'senc'.
+    """
+    folded = fold(name)
+    folded = _DOTTED_ABBREVIATION.sub(lambda m: m.group(0).replace('.', ''), folded)
+    return tuple(token for token in _NON_ALPHANUMERIC.split(folded) if token)
+
+
+def is_legal_suffix(word: str) -> bool:
+    """True if the word is a legal-form suffix such as 'Inc.', 'Ltée' or 'S.E.N.C.'."""
+    return ''.join(normalize_name(word)) in LEGAL_SUFFIXES
+
+
+@lru_cache(maxsize=65536)
+def name_tokens(name: str) -> Tuple[str, ...]:
+    """Returns the distinctive tokens of a company name, without legal suffixes."""
+    return tuple(token for token in normalize_name(name) if token not in LEGAL_SUFFIXES)
+
+
+@lru_cache(maxsize=262144)
+def trigrams(token: str) -> Set[str]:
+    """Returns the trigrams of a token padded with one space on each side."""
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def token_similarity(a: str, b: str) -> float:
+    """Dice coefficient of the trigrams of two tokens, with exact matching for short tokens."""
+    if a == b:
+        return 1.0
+    if len(a) < MIN_FUZZY_TOKEN_LENGTH or len(b) < MIN_FUZZY_TOKEN_LENGTH:
+        return 0.0
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+class NameIndex:
+    """
+    A trigram index over the tokens of many documents (e.g. SERP result
+    titles), used to rank documents by fuzzy token-set similarity to a name.
+
+    The score of a document is the mean, over the name's tokens, of the best
+    similarity to any token of the document, so 'ENTRETIEN V BECK INC'
+    still scores about 0.96 against 'Entretient V. Beck'.
+    """
+
+    def __init__(self, token_threshold: float = DEFAULT_TOKEN_THRESHOLD):
+        self.token_threshold = token_threshold
+        self._docs_by_token: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._tokens_by_trigram: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, doc_id: Hashable, text: str):
+        """Indexes the tokens of a document."""
+        for token in normalize_name(text):
+            if token not in self._docs_by_token:
+                for gram in trigrams(token):
+                    self._tokens_by_trigram[gram].add(token)
+            self._docs_by_token[token].add(doc_id)
+
+    def similar_tokens(self, token: str) -> Dict[str, float]:
+        """Returns the indexed tokens at least token_threshold similar to token, with their similarity."""
+        similar = {token: 1.0} if token in self._docs_by_token else {}
+        if len(token) < MIN_FUZZY_TOKEN_LENGTH:
+            return similar
+
+        shared_counts: Dict[str, int] = defaultdict(int)
+        for gram in trigrams(token):
+            for candidate in self._tokens_by_trigram.get(gram, ()):
+                shared_counts[candidate] += 1
+
+        token_gram_count = len(trigrams(token))
+        for candidate, shared in shared_counts.items():
+            if candidate == token or len(candidate) < MIN_FUZZY_TOKEN_LENGTH:
+                continue
+            similarity = 2 * shared / (token_gram_count + len(trigrams(candidate)))
+            if similarity >= self.token_threshold:
+                similar[candidate] = similarity
+        return similar
+
+    def rank(self, name: str, min_score: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """
+        Ranks the indexed documents by token-set similarity to a company name.
+
+        Returns:
+            (doc_id, score) pairs with score >= min_score, best first.
+        """
+        query_tokens = set(name_tokens(name))
+        if not query_tokens:
+            return []
+
+        best: Dict[Hashable, Dict[str, float]] = defaultdict(dict)
+        for query_token in query_tokens:
+            for token, similarity in self.similar_tokens(query_token).items():
+                for doc_id in self._docs_by_token[token]:
+                    if similarity > best[doc_id].get(query_token, 0.0):
+                        best[doc_id][query_token] = similarity
+
+        ranked = [
+            (doc_id, sum(similarities.values()) / len(query_tokens))
+            for doc_id, similarities in best.items()
+        ]
+        ranked = [(doc_id, score) for doc_id, score in ranked if score >= min_score]
+        return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+
+def build_name_index(documents: Iterable[Tuple[Hashable, str]],
+                     token_threshold: float = DEFAULT_TOKEN_THRESHOLD) -> NameIndex:
+    """Builds a NameIndex over (doc_id, text) pairs."""
+    index = NameIndex(token_threshold)
+    for doc_id, text in documents:
+        index.add(doc_id, text)
+    return index
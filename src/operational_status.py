@@ -0,0 +1,297 @@
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from serp_features import extract_serp_contacts
+from structured_extractor import _field, get_markdown
+
+STATUS_ACTIVE = 'Active'
+STATUS_LIKELY_CLOSED = 'Likely Closed'
+STATUS_UNKNOWN = 'Unknown'
+# Below this confidence the signals are too weak or contradictory to decide
+MIN_STATUS_CONFIDENCE = 0.3
+
+# How strongly each signal points to its status, between 0 and 1
+SIGNAL_WEIGHTS = {
+    # SERP
+    'listing_permanently_closed': 0.9,
+    'listing_temporarily_closed': 0.4,
+    'listing_open': 0.6,
+    'closure_phrase': 0.6,
+    'registry_closed': 0.8,
+    'registry_active': 0.5,
+    'registry_only': 0.25,
+    'recent_serp_activity': 0.3,
+    # Crawl
+    'dead_domain': 0.6,
+    'unreachable_site': 0.3,
+    'missing_page': 0.2,
+    'parked_domain': 0.7,
+    'closure_notice': 0.7,
+    'live_site': 0.4,
+    'fresh_page': 0.4,
+    'stale_page': 0.25,
+}
+SIGNAL_STATUS = {
+    'listing_permanently_closed': STATUS_LIKELY_CLOSED,
+    'listing_temporarily_closed': STATUS_LIKELY_CLOSED,
+    'listing_open': STATUS_ACTIVE,
+    'closure_phrase': STATUS_LIKELY_CLOSED,
+    'registry_closed': STATUS_LIKELY_CLOSED,
+    'registry_active': STATUS_ACTIVE,
+    'registry_only': STATUS_LIKELY_CLOSED,
+    'recent_serp_activity': STATUS_ACTIVE,
+    'dead_domain': STATUS_LIKELY_CLOSED,
+    'unreachable_site': STATUS_LIKELY_CLOSED,
+    'missing_page': STATUS_LIKELY_CLOSED,
+    'parked_domain': STATUS_LIKELY_CLOSED,
+    'closure_notice': STATUS_LIKELY_CLOSED,
+    'live_site': STATUS_ACTIVE,
+    'fresh_page': STATUS_ACTIVE,
+    'stale_page': STATUS_LIKELY_CLOSED,
+}
+
+# Business registries and company directories; their pages exist whether the business operates or not
+REGISTRY_DOMAINS = (
+    'registreentreprises.quebec', 'quebecentreprises.com', 'opencorporates.com', 'canadacompanyregistry.com',
+    'ic.gc.ca', 'ised-isde.canada.ca', 'b2bhint.com', 'dnb.com', 'bizapedia.com', 'companieslist.co',
+    'canadacompanies.ca', 'opengovca.com', 'bizprofile.net',
+)
+# Pages older than this many years suggest an abandoned site
+STALE_PAGE_YEARS = 4
+
+_CLOSURE_PHRASE = re.compile(
+    r'permanently closed|closed (?:its|our) doors|out of business|no longer in business|ceased operations'
+    r'|went bankrupt|filed for bankruptcy|ferm[ée]e? d[ée]finitivement|fermeture d[ée]finitive'
+    r'|(?:a |ont )?ferm[ée]e? (?:ses|leurs|nos) portes|fermera (?:ses|leurs|nos) portes'
+    r'|cess[ée]e? (?:ses|leurs|nos) activit[ée]s|en faillite|d[ée]clar[ée]e? faillite',
+    re.IGNORECASE
+)
+_REGISTRY_CLOSED = re.compile(
+    r'(?<![\w-])(?:dissolved|dissoute?|radi[ée]e?|radiation|inactive|struck off|cancell?ed|bankrupt)(?![\w-])',
+    re.IGNORECASE
+)
+_REGISTRY_ACTIVE = re.compile(
+    r'(?:status|statut|state)\s*:?\s*(?:active|actif|immatricul[ée]e?|en vigueur)(?![\w-])',
+    re.IGNORECASE
+)
+_RELATIVE_DATE = re.compile(
+    r'\b\d+\s+(?:hours?|days?|weeks?|months?)\s+ago\b|\bil y a \d+\s+(?:heures?|jours?|semaines?|mois)\b',
+    re.IGNORECASE
+)
+_YEAR = re.compile(r'(?<!\d)(?:19|20)\d{2}(?!\d)')
+_COPYRIGHT_YEAR = re.compile(r'(?:©|&copy;|\(c\)|copyright)\s*(?:(?:19|20)\d{2}\s*[-–]\s*)?((?:19|20)\d{2})',
+                             re.IGNORECASE)
+# Only the concrete resolver and connection failures; a generic timeout is inconclusive (a slow site, a
+# busy crawler) and yields no signal
+_DNS_ERROR = re.compile(r'\b(?:ERR_NAME_NOT_RESOLVED|ENOTFOUND|NXDOMAIN)\b')
+_CONNECTION_ERROR = re.compile(r'\b(?:ERR_CONNECTION_REFUSED|ERR_CONNECTION_TIMED_OUT)\b')
+_PARKED_PAGE = re.compile(
+    r'domain (?:is |may be )?for sale|buy this domain|this domain (?:name )?(?:has expired|is parked|may be for sale)'
+    r'|parked (?:free|domain)|domain parking|sedoparking|hugedomains|dan\.com|afternic'
+    r'|ce domaine (?:est|pourrait être) à vendre|nom de domaine expir[ée]',
+    re.IGNORECASE
+)
+
+
+class StatusSignal(NamedTuple):
+    """One piece of evidence about the operational status of a debtor."""
+    name: str
+    status: str
+    weight: float
+    detail: str
+
+
+class StatusClassification(NamedTuple):
+    """The operational status of a debtor, with its confidence and the signals behind it."""
+    status: str
+    confidence: float
+    evidence: List[StatusSignal]
+
+
+def _signal(name: str, detail: str) -> StatusSignal:
+    return StatusSignal(name, SIGNAL_STATUS[name], SIGNAL_WEIGHTS[name], detail)
+
+
+def _hostname(url: str) -> str:
+    hostname = urlparse(url).hostname or ''
+    return hostname[4:] if hostname.startswith('www.') else hostname
+
+
+def is_registry_domain(url: str) -> bool:
+    """True if the URL belongs to a business registry or a company directory."""
+    hostname = _hostname(url)
+    return any(hostname == domain or hostname.endswith('.' + domain) for domain in REGISTRY_DOMAINS)
+
+
+def _current_year(current_year: Optional[int]) -> int:
+    return current_year or time.gmtime().tm_year
+
+
+def serp_signals(serp_api_result: Dict[str, Any], positions: Optional[Iterable[int]] = None,
+                 current_year: Optional[int] = None) -> List[StatusSignal]:
+    """
+    Collects the status signals of a SERP API result: closed flags and hours
+    of the matching knowledge graph and local listings, closure phrases,
+    registry statuses and dates of the relevant organic results.
+
+    Args:
+        serp_api_result: The SERP API result.
+        positions: The 1-based positions of the relevant organic results.
+            All results are read by default.
+        current_year: The reference year of the recency checks (this year by default).
+    """
+    current_year = _current_year(current_year)
+    signals = []
+
+    listings = extract_serp_contacts(serp_api_result)
+    if listings['sources']:
+        sources = ', '.join(listings['sources'])
+        if listings['permanently_closed']:
+            signals.append(_signal('listing_permanently_closed', f'Permanently closed in {sources}'))
+        elif listings['temporarily_closed']:
+            signals.append(_signal('listing_temporarily_closed', f'Temporarily closed in {sources}'))
+        elif listings['hours']:
+            signals.append(_signal('listing_open', f'Opening hours listed in {sources}'))
+
+    organic_results = serp_api_result.get('organic_results', [])
+    if positions is not None:
+        organic_results = [organic_results[position - 1] for position in positions
+                           if 0 < position <= len(organic_results)]
+
+    latest_year = None
+    registry_results = 0
+    for result in organic_results:
+        link = result.get('link', '')
+        text = f"{result.get('title', '')} {result.get('snippet', '')}"
+        closure = _CLOSURE_PHRASE.search(text)
+        if closure:
+            signals.append(_signal('closure_phrase', f"'{closure.group(0)}' in {link}"))
+        if is_registry_domain(link):
+            registry_results += 1
+            registry_closed = _REGISTRY_CLOSED.search(text)
+            registry_active = _REGISTRY_ACTIVE.search(text)
+            if registry_closed:
+                signals.append(_signal('registry_closed', f"'{registry_closed.group(0)}' in {link}"))
+            elif registry_active:
+                signals.append(_signal('registry_active', f"'{registry_active.group(0)}' in {link}"))
+        elif not closure:
+            # A dated result that does not announce a closure shows recent activity
+            dates = f"{result.get('date', '')} {result.get('displayed_link', '')}"
+            if _RELATIVE_DATE.search(dates):
+                latest_year = current_year
+            years = [int(year) for year in _YEAR.findall(dates) if int(year) <= current_year]
+            if years and (latest_year is None or max(years) > latest_year):
+                latest_year = max(years)
+
+    if organic_results and registry_results == len(organic_results):
+        signals.append(_signal('registry_only', f'{registry_results} relevant results, all from registries'))
+    if latest_year is not None and latest_year >= current_year - 1:
+        signals.append(_signal('recent_serp_activity', f'Result dated {latest_year}'))
+    return signals
+
+
+def _page_year(crawl_result: Any, page_text: str) -> Optional[int]:
+    """The latest of the copyright years of a page and its Last-Modified header."""
+    years = [int(year) for year in _COPYRIGHT_YEAR.findall(page_text)]
+    last_modified = (_field(crawl_result, 'response_headers') or {}).get('last-modified')
+    if last_modified:
+        try:
+            years.append(parsedate_to_datetime(last_modified).year)
+        except (TypeError, ValueError):
+            pass
+    return max(years) if years else None
+
+
+def crawl_signals(crawl_results: Iterable[Any], current_year: Optional[int] = None) -> List[StatusSignal]:
+    """
+    Collects the status signals of the crawl results of a debtor's sites:
+    dead domains, unreachable sites, parked pages, closure notices and
+    page freshness.
+
+    Args:
+        crawl_results: crawl4ai CrawlResults, or their JSON form from the REST API.
+        current_year: The reference year of the freshness checks (this year by default).
+    """
+    current_year = _current_year(current_year)
+    signals = []
+    for crawl_result in crawl_results:
+        url = _field(crawl_result, 'url') or ''
+        error = _field(crawl_result, 'error_message') or ''
+        status_code = _field(crawl_result, 'status_code')
+        if not _field(crawl_result, 'success', not error):
+            if _DNS_ERROR.search(error):
+                signals.append(_signal('dead_domain', f'{_hostname(url)} does not resolve'))
+            elif _CONNECTION_ERROR.search(error):
+                signals.append(_signal('unreachable_site', f'{url}: {error[:80]}'))
+            elif status_code in (404, 410):
+                signals.append(_signal('missing_page', f'{url} returned {status_code}'))
+            continue
+        if status_code in (404, 410):
+            signals.append(_signal('missing_page', f'{url} returned {status_code}'))
+            continue
+
+        html = _field(crawl_result, 'html') or ''
+        text = get_markdown(crawl_result) or html
+        parked = _PARKED_PAGE.search(text) or _PARKED_PAGE.search(html)
+        if parked:
+            signals.append(_signal('parked_domain', f"'{parked.group(0)}' on {url}"))
+            continue
+        closure = _CLOSURE_PHRASE.search(text)
+        if closure:
+            signals.append(_signal('closure_notice', f"'{closure.group(0)}' on {url}"))
+        else:
+            signals.append(_signal('live_site', f'{url} is online'))
+
+        page_year = _page_year(crawl_result, f'{html} {text}' if html else text)
+        if page_year is not None and page_year <= current_year:
+            if page_year >= current_year - 1:
+                signals.append(_signal('fresh_page', f'{url} updated in {page_year}'))
+            elif page_year <= current_year - STALE_PAGE_YEARS:
+                signals.append(_signal('stale_page', f'{url} last updated in {page_year}'))
+    return signals
+
+
+def classify_status(signals: Iterable[StatusSignal]) -> StatusClassification:
+    """
+    Combines status signals into a status.
+
+    The signals of each status reinforce each other (belief = 1 - Π(1 - weight)),
+    and the stronger status wins, discounted by the belief in the other one.
+    Weak or contradictory evidence gives STATUS_UNKNOWN.
+    """
+    signals = list(signals)
+    doubt = {STATUS_ACTIVE: 1.0, STATUS_LIKELY_CLOSED: 1.0}
+    for signal in signals:
+        doubt[signal.status] *= 1.0 - signal.weight
+    active = 1.0 - doubt[STATUS_ACTIVE]
+    closed = 1.0 - doubt[STATUS_LIKELY_CLOSED]
+
+    if closed >= active:
+        status, confidence = STATUS_LIKELY_CLOSED, closed * (1.0 - active)
+    else:
+        status, confidence = STATUS_ACTIVE, active * (1.0 - closed)
+    if confidence < MIN_STATUS_CONFIDENCE:
+        status = STATUS_UNKNOWN
+    evidence = sorted(signals, key=lambda signal: signal.weight, reverse=True)
+    return StatusClassification(status, round(confidence, 3), evidence)
+
+
+def classify_operational_status(serp_api_result: Optional[Dict[str, Any]] = None,
+                                crawl_results: Iterable[Any] = (),
+                                positions: Optional[Iterable[int]] = None,
+                                current_year: Optional[int] = None) -> StatusClassification:
+    """
+    Classifies a debtor as 'Active', 'Likely Closed' or 'Unknown' from its
+    SERP and the crawl results of its sites.
+
+    Returns:
+        The status, its confidence and the signals behind it, strongest first.
+    """
+    signals = []
+    if serp_api_result:
+        signals.extend(serp_signals(serp_api_result, positions, current_year))
+    signals.extend(crawl_signals(crawl_results, current_year))
+    return classify_status(signals)
@@ -0,0 +1,348 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from name_matching import LEGAL_SUFFIXES, fold, name_tokens, token_similarity
+
+# Role cues by canonical role, French and English
+ROLE_CUES = {
+    'owner': ('owner', 'co-owner', 'proprietor', 'propriétaire', 'copropriétaire', 'co-propriétaire'),
+    'founder': ('founder', 'co-founder', 'cofounder', 'fondateur', 'fondatrice', 'cofondateur',
+                'cofondatrice', 'co-fondateur', 'co-fondatrice'),
+    'president': ('president', 'président', 'présidente', 'pdg', 'ceo', 'chief executive officer',
+                  'président-directeur général', 'présidente-directrice générale'),
+    'director': ('directeur général', 'directrice générale', 'managing director', 'general manager',
+                 'gérant', 'gérante', 'directeur', 'directrice'),
+    'partner': ('partner', 'managing partner', 'associé', 'associée'),
+}
+# How strongly each role implies that the person owns or runs the business
+ROLE_WEIGHTS = {'owner': 1.0, 'founder': 0.95, 'president': 0.95, 'partner': 0.85, 'director': 0.75}
+# Phrases introducing the owner: 'owned by Jean Tremblay', 'fondée par Marie Roy'
+OWNED_BY_CUES = {
+    'owner': ('owned by', 'appartient à', 'propriété de'),
+    'founder': ('founded by', 'fondée par', 'fondé par', 'fondée en \\d{4} par', 'fondé en \\d{4} par'),
+    'president': ('run by', 'led by', 'dirigée par', 'dirigé par'),
+}
+
+# Base confidence of each pattern, before the role weight and the name checks
+PATTERN_CONFIDENCE = {'role_after': 0.55, 'role_before': 0.5, 'owned_by': 0.6, 'linkedin': 0.6}
+GIVEN_NAME_BONUS = 0.3
+COMPANY_MATCH_BONUS = 0.1
+MAX_CONFIDENCE = 0.99
+# Owners below this confidence are left to the LLM
+DEFAULT_MIN_CONFIDENCE = 0.7
+
+# Common given names in Québec and the rest of Canada, in folded form
+GIVEN_NAMES = frozenset((
+    # French
+    'alain', 'alexandre', 'alexis', 'andre', 'andree', 'annie', 'antoine', 'benoit', 'bernard', 'carl',
+    'carole', 'caroline', 'catherine', 'chantal', 'charles', 'christian', 'christiane', 'claude', 'claudine',
+    'daniel', 'danielle', 'denis', 'denise', 'diane', 'dominique', 'eric', 'etienne', 'francis', 'francine',
+    'francois', 'francoise', 'frederic', 'gabriel', 'gaetan', 'genevieve', 'gerald', 'gilles', 'ginette',
+    'guillaume', 'guy', 'helene', 'isabelle', 'jacques', 'jean', 'jean-claude', 'jean-francois', 'jean-guy',
+    'jean-marc', 'jean-philippe', 'jean-pierre', 'jean-sebastien', 'jocelyn', 'jocelyne', 'johanne',
+    'josee', 'julie', 'julien', 'lise', 'louis', 'louise', 'luc', 'lucie', 'manon', 'marc', 'marc-andre',
+    'marcel', 'marie', 'marie-claude', 'marie-eve', 'marie-josee', 'martin', 'mathieu', 'maxime', 'michel',
+    'micheline', 'mireille', 'monique', 'nathalie', 'nicolas', 'normand', 'olivier', 'pascal', 'patrice',
+    'philippe', 'pierre', 'rejean', 'rene', 'richard', 'robert', 'roger', 'sebastien', 'serge', 'simon',
+    'solange', 'sophie', 'stephane', 'sylvain', 'sylvie', 'real', 'yves', 'yvon', 'yvonne',
+    'ghislain', 'gaston', 'raymond', 'rosaire', 'lucien', 'marcelle', 'jeannine', 'nicole', 'veronique',
+    'valerie', 'melanie', 'stephanie', 'emilie', 'audrey', 'karine', 'marilyn', 'mylene', 'joel', 'joelle',
+    # English
+    'adam', 'alan', 'alex', 'amanda', 'amy', 'andrew', 'angela', 'anne', 'anthony', 'barbara', 'ben',
+    'benjamin', 'bill', 'bob', 'brad', 'brandon', 'brian', 'bruce', 'carol', 'chris', 'christine',
+    'christopher', 'craig', 'cynthia', 'dan', 'dave', 'david', 'deborah', 'dennis', 'donald', 'doug',
+    'douglas', 'edward', 'elizabeth', 'emily', 'emma', 'frank', 'gary', 'george', 'greg', 'gregory',
+    'heather', 'jack', 'james', 'jamie', 'jane', 'jason', 'jeff', 'jeffrey', 'jennifer', 'jessica', 'jim',
+    'joe', 'john', 'jonathan', 'joseph', 'joshua', 'karen', 'kathleen', 'kelly', 'ken', 'kenneth', 'kevin',
+    'kim', 'laura', 'linda', 'lisa', 'mark', 'mary', 'matt', 'matthew', 'melissa', 'michael', 'michelle',
+    'mike', 'nancy', 'patricia', 'patrick', 'paul', 'peter', 'rachel', 'rebecca', 'rick', 'rob', 'ron',
+    'ronald', 'ryan', 'sam', 'samuel', 'sandra', 'sarah', 'scott', 'sean', 'sharon', 'shawn', 'stephen',
+    'steve', 'steven', 'susan', 'thomas', 'tim', 'timothy', 'tom', 'tony', 'tyler', 'william', 'wayne',
+    # Other frequent in Canadian registries
+    'mohamed', 'mohammed', 'ahmed', 'ali', 'omar', 'karim', 'raj', 'sanjay', 'wei', 'li', 'chen', 'ming',
+    'giuseppe', 'antonio', 'giovanni', 'maria', 'jose', 'carlos', 'luis', 'juan', 'manuel', 'paolo',
+))
+
+# Capitalized words that often follow a role cue but are not part of a person's name
+NON_NAME_WORDS = LEGAL_SUFFIXES | {
+    'the', 'le', 'la', 'les', 'de', 'du', 'des', 'et', 'and', 'of', 'our', 'notre', 'votre', 'chez',
+    'construction', 'renovation', 'renovations', 'services', 'service', 'entreprise', 'entreprises',
+    'canada', 'quebec', 'montreal', 'laval', 'linkedin', 'facebook', 'rue', 'avenue', 'boulevard',
+    'president', 'owner', 'founder', 'directeur', 'directrice', 'ceo', 'pdg', 'monsieur', 'madame',
+    'mr', 'mrs', 'ms', 'm', 'mme', 'dr',
+}
+
+_NAME_WORD = r"(?:[A-ZÀ-ÖØ-Þ]['’]|Mac|Mc)?[A-ZÀ-ÖØ-Þ][a-zà-öø-ÿ]+(?:-[A-ZÀ-ÖØ-Þ][a-zà-öø-ÿ]+)*"
+_PARTICLE = r'(?:de|du|des|da|di|del|van|von|le|la|st|ste|mc|mac)'
+_PERSON = rf"{_NAME_WORD}(?:[ \t]+(?:{_PARTICLE}[ \t]+)?{_NAME_WORD}){{1,2}}"
+_HONORIFIC = r'(?:(?:M|Mme|Mr|Mrs|Ms|Dr|Monsieur|Madame)\.?[ \t]+)?'
+
+
+def _role_alternation(cues: Dict[str, Tuple[str, ...]]) -> str:
+    variants = {variant for names in cues.values() for name in names for variant in (name, fold(name))}
+    return '|'.join(variant if '\\' in variant else re.escape(variant)
+                    for variant in sorted(variants, key=len, reverse=True))
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Builds a regex matching any of the words, nested by common prefix
+    ('own(?:er|ed by)'), which the regex engine rejects in one character
+    at most positions instead of trying every alternative.
+    """
+    tree: Dict[str, dict] = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{pattern})?' if '' in node else pattern
+
+    return emit(tree)
+
+
+_ROLE_WORDS = {variant for names in ROLE_CUES.values() for name in names for variant in (name, fold(name))}
+_ROLE = rf'(?i:{_trie_pattern(_ROLE_WORDS)})'
+# Lowercase cues searched first; the full patterns only run around them
+_CUE = re.compile(_trie_pattern(_ROLE_WORDS | {
+    variant for cues in OWNED_BY_CUES.values() for cue in cues
+    for variant in (cue.split(' \\d')[0], fold(cue.split(' \\d')[0]))
+}))
+# Characters of text read around a cue for the name: honorific, three words and a separator
+CONTEXT_BEFORE = 80
+CONTEXT_AFTER = 80
+
+_PATTERNS = {
+    # 'Jean Tremblay, président', 'Jean Tremblay (Owner)', 'Jean Tremblay est le propriétaire'
+    'role_after': re.compile(
+        rf'(?<![\w-]){_HONORIFIC}(?P<name>{_PERSON})[ \t]*(?:,|\(|[-–—|:]|(?i:is|est))?[ \t]*'
+        rf'(?:(?i:the|our|le|la|notre|votre|l[\'’])[ \t]*)?(?:(?i:co)-?)?(?P<role>{_ROLE})(?![\w-])'
+    ),
+    # 'Président : Jean Tremblay', 'Owner Jean Tremblay'
+    'role_before': re.compile(
+        rf'(?<![\w-])(?P<role>{_ROLE})[ \t]*[,:\-–—]?[ \t]*{_HONORIFIC}(?P<name>{_PERSON})(?![\w-])'
+    ),
+    # 'owned by Jean Tremblay', 'fondée en 1998 par Marie Roy'
+    'owned_by': re.compile(
+        rf'(?<![\w-])(?P<role>(?i:{_role_alternation(OWNED_BY_CUES)}))[ \t]+{_HONORIFIC}'
+        rf'(?P<name>{_PERSON})(?![\w-])'
+    ),
+}
+# 'Jean Tremblay - Président - Rénovateur Aubaine Inc. | LinkedIn'
+_LINKEDIN_TITLE = re.compile(
+    rf'^\s*(?P<name>{_PERSON})\s+[-–—|]\s+(?P<title>[^-–—|]{{2,80}}?)'
+    rf'(?:\s+(?:[-–—|]|(?i:at|chez|@))\s+(?P<company>[^|]+?))?\s*(?:\|\s*LinkedIn.*)?$'
+)
+_ROLE_SEARCH = re.compile(rf'(?<![\w-])(?P<role>{_ROLE})(?![\w-])')
+_WHITESPACE = re.compile(r'\s+')
+
+_ROLE_BY_CUE = {fold(name): role for role, names in ROLE_CUES.items() for name in names}
+_OWNED_BY_ROLE = [(re.compile(cue, re.IGNORECASE), role) for role, cues in OWNED_BY_CUES.items() for cue in cues]
+
+
+class OwnerCandidate(NamedTuple):
+    """A person found with an ownership or management role."""
+    name: str
+    role: str
+    confidence: float
+    source: str
+    evidence: str
+
+
+def _canonical_role(cue: str, kind: str) -> str:
+    if kind == 'owned_by':
+        for pattern, role in _OWNED_BY_ROLE:
+            if pattern.fullmatch(cue):
+                return role
+    cue = _WHITESPACE.sub(' ', fold(cue)).strip()
+    return _ROLE_BY_CUE.get(cue, 'director')
+
+
+def _clean_name(name: str) -> Optional[str]:
+    """Drops the non-name words around a matched name; None when fewer than two name words remain."""
+    words = name.split()
+    while words and fold(words[0]) in NON_NAME_WORDS:
+        words.pop(0)
+    while words and fold(words[-1]) in NON_NAME_WORDS:
+        words.pop()
+    if len(words) < 2 or any(fold(word) in NON_NAME_WORDS and len(word) > 3 for word in words):
+        return None
+    return ' '.join(words)
+
+
+def _is_given_name(name: str) -> bool:
+    first = fold(name.split()[0])
+    return first in GIVEN_NAMES or first.split('-')[0] in GIVEN_NAMES
+
+
+def _matches_company(company: Optional[str], company_name: Optional[str]) -> bool:
+    if not company or not company_name:
+        return False
+    expected = name_tokens(company_name)
+    found = name_tokens(company)
+    if not expected or not found:
+        return False
+    matched = sum(max(token_similarity(token, other) for other in found) >= 0.75 for token in expected)
+    return matched / len(expected) >= 0.8
+
+
+def _score(kind: str, role: str, name: str, company_match: bool = False) -> float:
+    confidence = PATTERN_CONFIDENCE[kind] * ROLE_WEIGHTS.get(role, 0.5)
+    if _is_given_name(name):
+        confidence += GIVEN_NAME_BONUS
+    if company_match:
+        confidence += COMPANY_MATCH_BONUS
+    return round(min(confidence, MAX_CONFIDENCE), 3)
+
+
+def iter_cue_windows(text: str) -> Iterator[str]:
+    """Yields the parts of a text around role cues, merged when they overlap."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Some characters change length when lowercased; the offsets would not match
+        yield text
+        return
+    window_start = window_end = None
+    for match in _CUE.finditer(lowered):
+        start = max(0, match.start() - CONTEXT_BEFORE)
+        # Never start a window in the middle of a word
+        start = max(text.rfind(' ', 0, start), text.rfind('\n', 0, start), -1) + 1 if start else 0
+        end = match.end() + CONTEXT_AFTER
+        if window_end is not None and start <= window_end:
+            window_end = max(window_end, end)
+            continue
+        if window_end is not None:
+            yield text[window_start:window_end]
+        window_start, window_end = start, end
+    if window_end is not None:
+        yield text[window_start:window_end]
+
+
+def iter_owner_candidates(text: str, source: str = 'text') -> Iterator[OwnerCandidate]:
+    """
+    Finds the people named next to a role cue in a text.
+
+    Args:
+        text: A snippet or the markdown of a crawled page.
+        source: Label stored in the candidates ('snippet', 'crawl', ...).
+    """
+    for window in iter_cue_windows(text):
+        yield from _iter_window_candidates(window, source)
+
+
+def _iter_window_candidates(window: str, source: str) -> Iterator[OwnerCandidate]:
+    for kind, pattern in _PATTERNS.items():
+        for match in pattern.finditer(window):
+            name = _clean_name(match.group('name'))
+            if name is None:
+                continue
+            role = _canonical_role(match.group('role'), kind)
+            evidence = _WHITESPACE.sub(' ', match.group(0)).strip()
+            yield OwnerCandidate(name, role, _score(kind, role, name), source, evidence)
+
+
+def parse_linkedin_title(title: str, company_name: Optional[str] = None,
+                         source: str = 'linkedin') -> Optional[OwnerCandidate]:
+    """
+    Reads a LinkedIn-style result title, 'Name - Title - Company | LinkedIn'.
+    The title must contain a role cue; a company matching company_name
+    raises the confidence.
+    """
+    match = _LINKEDIN_TITLE.match(title)
+    if match is None:
+        return None
+    role_match = _ROLE_SEARCH.search(match.group('title'))
+    name = _clean_name(match.group('name'))
+    if role_match is None or name is None:
+        return None
+    role = _canonical_role(role_match.group('role'), 'linkedin')
+    company_match = _matches_company(match.group('company'), company_name)
+    return OwnerCandidate(name, role, _score('linkedin', role, name, company_match), source, title.strip())
+
+
+def extract_serp_owners(serp_api_result: Dict[str, Any],
+                        positions: Optional[Iterable[int]] = None) -> List[OwnerCandidate]:
+    """
+    Finds owner candidates in the organic results of a SERP API result:
+    LinkedIn-style titles, and role cues in titles and snippets.
+
+    Args:
+        serp_api_result: The SERP API result; its query is the company name.
+        positions: The 1-based positions of the results to read, e.g. the
+            relevant sites. All results are read by default.
+    """
+    company_name = serp_api_result.get('search_parameters', {}).get('q')
+    organic_results = serp_api_result.get('organic_results', [])
+    if positions is not None:
+        organic_results = [organic_results[position - 1] for position in positions
+                           if 0 < position <= len(organic_results)]
+
+    candidates = []
+    for result in organic_results:
+        title = result.get('title', '')
+        is_linkedin = 'linkedin.' in result.get('link', '') or title.rstrip().endswith('LinkedIn')
+        linkedin_candidate = parse_linkedin_title(title, company_name) if is_linkedin else None
+        if linkedin_candidate:
+            candidates.append(linkedin_candidate)
+        else:
+            candidates.extend(iter_owner_candidates(title, 'snippet'))
+        candidates.extend(iter_owner_candidates(result.get('snippet', ''), 'snippet'))
+    return candidates
+
+
+def merge_owner_candidates(candidates: Iterable[OwnerCandidate]) -> List[OwnerCandidate]:
+    """
+    Merges the candidates naming the same person (accent- and case-insensitive).
+
+    Several patterns matching the same text are one finding: candidates of
+    the same source whose evidence contains the other's are collapsed into
+    the most confident of them. Distinct findings reinforce each other: the
+    merged confidence is 1 - Π(1 - confidence), and the role and evidence of
+    the best finding are kept.
+
+    Returns:
+        The merged candidates, most confident first.
+    """
+    # Per person, the best candidate of each distinct finding, with its widest evidence
+    findings: Dict[str, List[Tuple[str, OwnerCandidate]]] = {}
+    for candidate in candidates:
+        person_findings = findings.setdefault(fold(candidate.name), [])
+        evidence = fold(candidate.evidence)
+        for i, (finding_evidence, finding) in enumerate(person_findings):
+            if finding.source != candidate.source or (
+                    evidence not in finding_evidence and finding_evidence not in evidence):
+                continue
+            person_findings[i] = (
+                max(evidence, finding_evidence, key=len),
+                candidate if candidate.confidence > finding.confidence else finding
+            )
+            break
+        else:
+            person_findings.append((evidence, candidate))
+
+    merged = []
+    for person_findings in findings.values():
+        best = max((finding for _, finding in person_findings), key=lambda finding: finding.confidence)
+        doubt = 1.0
+        for _, finding in person_findings:
+            doubt *= 1.0 - finding.confidence
+        merged.append(best._replace(confidence=round(min(1.0 - doubt, MAX_CONFIDENCE), 3)))
+    return sorted(merged, key=lambda candidate: candidate.confidence, reverse=True)
+
+
+def split_owner_candidates(candidates: Iterable[OwnerCandidate], min_confidence: float = DEFAULT_MIN_CONFIDENCE
+                           ) -> Tuple[List[OwnerCandidate], List[OwnerCandidate]]:
+    """
+    Merges the candidates and splits them into the confident owners, which
+    can be saved as extracted_owners, and the uncertain ones left to the LLM.
+    """
+    confident, uncertain = [], []
+    for candidate in merge_owner_candidates(candidates):
+        (confident if candidate.confidence >= min_confidence else uncertain).append(candidate)
+    return confident, uncertain
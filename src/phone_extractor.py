@@ -0,0 +1,89 @@
+import re
+import phonenumbers
+from functools import lru_cache
+from typing import Iterator, List, Optional, Set, Tuple
+
+# Shortest valid North American number: the 7-digit Canadian 310-XXXX numbers
+MIN_PHONE_DIGITS = 7
+
+# Runs of at least MIN_PHONE_DIGITS digits joined by up to 4 separator
+# characters ('514 794-5711', '(514) 794 5711', '+1 438.555.0142'), a superset
+# of what phonenumbers.PhoneNumberMatcher accepts as a candidate. Shorter
+# numbers (years, prices, civic numbers) are rejected inside the regex engine.
+_DIGIT_RUN = re.compile(r'\d(?:(?:[^\w\r\n]|x){0,4}\d){%d,}' % (MIN_PHONE_DIGITS - 1))
+# Text kept around a run so the matcher sees the same neighbourhood as in
+# the full text: leading '+' or '(', surrounding letters, extensions
+# ('ext. 123', 'x123', 'poste 123').
+CONTEXT_BEFORE = 8
+CONTEXT_AFTER = 24
+# Longest window memoized by _match_cached_window: one or two numbers with
+# their context. Longer windows, merged on pages full of numbers, are rarely
+# seen again and would make the cache hold hundreds of MB.
+MAX_CACHED_WINDOW = 128
+
+
+def iter_candidate_windows(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    Yields the (start, end) windows of text that may contain a phone number,
+    with their context, merged when they overlap.
+    """
+    window_start = window_end = None
+    for run in _DIGIT_RUN.finditer(text):
+        start = max(0, run.start() - CONTEXT_BEFORE)
+        end = min(len(text), run.end() + CONTEXT_AFTER)
+        if window_end is not None and start <= window_end:
+            window_end = max(window_end, end)
+            continue
+        if window_end is not None:
+            yield window_start, window_end
+        window_start, window_end = start, end
+    if window_end is not None:
+        yield window_start, window_end
+
+
+def _match_window(window: str, region: str) -> Tuple[Tuple[int, int, str], ...]:
+    """Runs the full phonenumbers matcher on a window."""
+    found: List[Tuple[int, int, str]] = []
+    for match in phonenumbers.PhoneNumberMatcher(window, region):
+        if phonenumbers.is_valid_number(match.number) and match.number.country_code == 1:
+            formatted_number = phonenumbers.format_number(
+                match.number,
+                phonenumbers.PhoneNumberFormat.NATIONAL
+            )
+            found.append((match.start, match.end, formatted_number))
+    return tuple(found)
+
+
+# Short windows recur across pages (the same footer, the same directory entry)
+_match_cached_window = lru_cache(maxsize=131072)(_match_window)
+
+
+def iter_phone_spans(text: str, region: str = 'CA') -> Iterator[Tuple[int, int, str]]:
+    """
+    Yields (start, end, formatted_number) for the valid North American phone
+    numbers of text. Only the digit-dense windows of the text are parsed.
+    """
+    for start, end in iter_candidate_windows(text):
+        match_window = _match_cached_window if end - start <= MAX_CACHED_WINDOW else _match_window
+        for match_start, match_end, formatted_number in match_window(text[start:end], region):
+            yield start + match_start, start + match_end, formatted_number
+
+
+def find_phone_numbers(text: str, region: str = 'CA') -> Set[str]:
+    """Returns the valid North American phone numbers of text, in national format."""
+    return {formatted_number for _, _, formatted_number in iter_phone_spans(text, region)}
+
+
+@lru_cache(maxsize=65536)
+def normalize_phone_number(raw_number: str, region: str = 'CA') -> Optional[str]:
+    """
+    Parses a single phone number, e.g. the target of a 'tel:' link, and
+    returns it in national format if it is a valid North American number.
+    """
+    try:
+        number = phonenumbers.parse(raw_number, region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(number) or number.country_code != 1:
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.NATIONAL)
@@ -0,0 +1,103 @@
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from serp_store import SerpStore, get_serp_store
+from utils import get_query_keywords, _is_missing_check_ok
+
+
+class QueryMatcher:
+    """
+    The keywords of one search query, computed once and reused for every
+    organic result of every search with the same query.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.keywords: FrozenSet[str] = get_query_keywords(query)
+        # Longest first, so the most selective keyword rejects a title early
+        self._ordered_keywords = tuple(sorted(self.keywords, key=len, reverse=True))
+
+    def is_match(self, text_lower: str) -> bool:
+        """True if every keyword occurs in the (already lowercased) text."""
+        return bool(self._ordered_keywords) and all(k in text_lower for k in self._ordered_keywords)
+
+    def find(self, text_lower: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Returns the keywords occurring in the (already lowercased) text with the (start, end) of each occurrence."""
+        found: Dict[str, List[Tuple[int, int]]] = {}
+        for keyword in self._ordered_keywords:
+            start = text_lower.find(keyword)
+            while start != -1:
+                found.setdefault(keyword, []).append((start, start + len(keyword)))
+                start = text_lower.find(keyword, start + 1)
+        return found
+
+
+@lru_cache(maxsize=65536)
+def get_query_matcher(query: str) -> QueryMatcher:
+    """Returns the shared matcher of a search query."""
+    return QueryMatcher(query)
+
+
+def score_organic_results(serp_api_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Scores every organic result of a SERP API result against its query keywords.
+
+    Returns:
+        One dict per organic result with its position, link, whether it is
+        relevant (same rule as `utils.select_relevant_sites`), the fraction of
+        keywords found in the title, the matched and missing keywords, and the
+        spans of the matches in the title.
+    """
+    matcher = get_query_matcher(serp_api_result.get("search_parameters", {}).get("q", ""))
+    keywords = matcher.keywords
+    scored = []
+
+    for item in serp_api_result.get("organic_results", []):
+        found = matcher.find(item.get('title', '').lower())
+        missing_check_ok = _is_missing_check_ok(item.get('missing'))
+
+        scored.append({
+            'position': item.get('position'),
+            'link': item.get('link'),
+            'relevant': bool(
+                keywords and len(found) == len(keywords) and missing_check_ok
+                and item.get('link') and item.get('position')
+            ),
+            'score': len(found) / len(keywords) if keywords else 0.0,
+            'matched_keywords': sorted(found),
+            'missing_keywords': sorted(keywords.difference(found)),
+            'missing_check_ok': missing_check_ok,
+            'spans': sorted((start, end, keyword) for keyword, spans in found.items() for start, end in spans),
+        })
+    return scored
+
+
+def score_relevant_sites_batch(searches: Mapping[Hashable, Dict[str, Any]]) -> Dict[Hashable, List[Dict[str, Any]]]:
+    """
+    Scores the organic results of many SERP API results in one pass.
+
+    Args:
+        searches: Mapping of an identifier (e.g. debtor ID) to a SERP API result.
+
+    Returns:
+        The output of `score_organic_results` for each identifier.
+    """
+    return {key: score_organic_results(serp_api_result) for key, serp_api_result in searches.items()}
+
+
+def select_relevant_sites_batch(searches: Mapping[Hashable, Dict[str, Any]]) -> Dict[Hashable, List[int]]:
+    """Batch version of `utils.select_relevant_sites`, returning the relevant positions per identifier."""
+    return {
+        key: [result['position'] for result in scored if result['relevant']]
+        for key, scored in score_relevant_sites_batch(searches).items()
+    }
+
+
+def score_serp_archive(store: Optional[SerpStore] = None,
+                       debtor_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Re-scores every search of the SERP store, reading only the query and
+    organic result columns, never the raw payloads.
+    """
+    store = store or get_serp_store()
+    return {debtor_id: score_organic_results(search) for debtor_id, search in store.iter_searches(debtor_ids)}
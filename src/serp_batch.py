@@ -0,0 +1,220 @@
+import asyncio
+import time
+import httpx
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    SERPAPI_SEARCH_URL,
+    SERPAPI_RATE_PER_SECOND,
+    SERPAPI_BURST,
+    SERPAPI_MAX_CONCURRENCY,
+    SERPAPI_MAX_RETRIES,
+)
+from fetch_debtor import (
+    SERP_API_KEY,
+    CACHE_MODES,
+    CACHE_ONLY,
+    READ_THROUGH,
+    REFRESH,
+    build_search_params_batch,
+    load_cached_search,
+    save_search_results,
+    search_stats,
+)
+from serp_cache import get_serp_cache, is_cacheable, make_cache_key
+from utils import backoff_delay, retry_after_delay
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket limiting how many requests are started per second.
+
+    `rate` tokens are added every second, up to `capacity`. Each request
+    consumes one token and waits when the bucket is empty.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+async def _fetch_search(client: httpx.AsyncClient, bucket: TokenBucket, debtor_id: int,
+                        params: Dict, max_retries: int) -> Optional[Dict]:
+    """Runs one SerpApi search, retrying transient failures. Every request sent is counted as paid."""
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        search_stats.paid_calls += 1
+        try:
+            response = await client.get(SERPAPI_SEARCH_URL, params=params)
+        except httpx.TransportError as e:
+            if attempt == max_retries:
+                print(f"Error performing Google search for debtor {debtor_id}: {e}")
+                return None
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        if response.status_code in RETRYABLE_STATUS_CODES and attempt < max_retries:
+            delay = retry_after_delay(response) or backoff_delay(attempt)
+            await asyncio.sleep(delay)
+            continue
+
+        try:
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPStatusError, ValueError) as e:
+            print(f"Error performing Google search for debtor {debtor_id}: {e}")
+            return None
+    return None
+
+
+async def iter_google_searches(
+        debtor_ids: Iterable[int],
+        rate_per_second: float = SERPAPI_RATE_PER_SECOND,
+        burst: int = SERPAPI_BURST,
+        max_concurrency: int = SERPAPI_MAX_CONCURRENCY,
+        max_retries: int = SERPAPI_MAX_RETRIES,
+        cache_mode: str = READ_THROUGH,
+) -> AsyncIterator[Tuple[int, Optional[List[Dict[str, Any]]]]]:
+    """
+    Runs Google searches for many debtors concurrently.
+
+    Searches are answered like `fetch_debtor.load_cached_search` when
+    possible (the debtor's saved search, then the SERP cache), and identical
+    searches within the batch are only paid once. Each raw result is saved
+    with `save_search_results` as soon as it arrives, and
+    (debtor_id, organic_results) pairs are yielded in completion order.
+    organic_results is None when the search failed or returned no results.
+    cache_mode has the same meaning as in `fetch_debtor.google_search`, and
+    hits, misses, refreshes and paid calls are counted in `fetch_debtor.search_stats`.
+    """
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache mode '{cache_mode}', expected one of {sorted(CACHE_MODES)}")
+    if not SERP_API_KEY and cache_mode != CACHE_ONLY:
+        print("Error: SERP_API_KEY not found in environment variables")
+        return
+
+    params_by_id = build_search_params_batch(debtor_ids)
+    pending: asyncio.Queue = asyncio.Queue()
+    for item in params_by_id.items():
+        pending.put_nowait(item)
+
+    done: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency * 2)
+    serp_cache = get_serp_cache()
+    # Searches currently in flight, by cache key, so duplicates in a batch are paid once
+    in_flight: Dict[str, asyncio.Future] = {}
+    bucket = TokenBucket(rate_per_second, burst)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        def count_uncached():
+            # A forced refresh skips the cache, so it is not a miss
+            if cache_mode == REFRESH:
+                search_stats.refreshes += 1
+            else:
+                search_stats.misses += 1
+
+        async def search(debtor_id: int, params: Dict) -> Tuple[Optional[Dict], bool]:
+            """Returns the search results of a debtor, and whether they still have to be saved for it."""
+            if cache_mode != REFRESH:
+                # Saved for the debtor already, or linked and saved by load_cached_search
+                search_results = load_cached_search(debtor_id)
+                if search_results is not None:
+                    search_stats.hits += 1
+                    return search_results, False
+
+            cache_key = make_cache_key(params)
+            if cache_key in in_flight:
+                search_results = await asyncio.shield(in_flight[cache_key])
+                if is_cacheable(search_results):
+                    search_stats.hits += 1
+                    serp_cache.link(debtor_id, params)
+                else:
+                    count_uncached()
+                return search_results, True
+
+            count_uncached()
+            if cache_mode == CACHE_ONLY:
+                return None, False
+
+            future = asyncio.get_running_loop().create_future()
+            in_flight[cache_key] = future
+            search_results = None
+            try:
+                search_results = await _fetch_search(client, bucket, debtor_id, params, max_retries)
+                if is_cacheable(search_results):
+                    serp_cache.put(params, search_results, debtor_id=debtor_id)
+            finally:
+                del in_flight[cache_key]
+                future.set_result(search_results)
+            return search_results, True
+
+        async def worker():
+            while True:
+                try:
+                    debtor_id, params = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    search_results, unsaved = await search(debtor_id, params)
+                    if search_results is not None and unsaved:
+                        await asyncio.to_thread(save_search_results, debtor_id, search_results)
+                except Exception as e:
+                    print(f"Error performing Google search for debtor {debtor_id}: {e}")
+                    search_results = None
+                await done.put((debtor_id, search_results))
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, max_concurrency))]
+        try:
+            for _ in range(len(params_by_id)):
+                debtor_id, search_results = await done.get()
+                if not search_results or 'organic_results' not in search_results:
+                    yield debtor_id, None
+                else:
+                    yield debtor_id, search_results['organic_results']
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def google_search_batch_async(debtor_ids: Iterable[int], **kwargs) -> Dict[str, int]:
+    """Runs a batch of searches and returns a summary of the outcome."""
+    summary = {'searched': 0, 'with_results': 0, 'failed_or_empty': 0}
+    start_time = time.monotonic()
+
+    async for debtor_id, organic_results in iter_google_searches(debtor_ids, **kwargs):
+        summary['searched'] += 1
+        if organic_results:
+            summary['with_results'] += 1
+        else:
+            summary['failed_or_empty'] += 1
+
+    duration = time.monotonic() - start_time
+    print(f"Searched {summary['searched']} debtors in {duration:.1f}s "
+          f"({summary['with_results']} with results, {summary['failed_or_empty']} failed or empty).")
+    print(f"Search stats: {search_stats}")
+    return summary
+
+
+def google_search_batch(debtor_ids: Iterable[int], **kwargs) -> Dict[str, int]:
+    """Synchronous entry point for `google_search_batch_async`."""
+    return asyncio.run(google_search_batch_async(debtor_ids, **kwargs))
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+from config import (
+    SERP_CACHE_DB_PATH,
+    SERP_CACHE_TTL_DAYS,
+    SERP_CACHE_MAX_ENTRIES,
+    SERP_CACHE_MAX_BYTES,
+)
+
+# Parameters that do not change the search results and must not be part of the key.
+IGNORED_PARAMS = {'api_key', 'output', 'no_cache', 'async'}
+
+
+def normalize_search_params(params: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Returns the search parameters in a canonical form.
+    Secrets are removed, values are stripped and the query is case- and
+    whitespace-insensitive.
+    """
+    normalized = {}
+    for key, value in params.items():
+        if key in IGNORED_PARAMS or value is None:
+            continue
+        value = ' '.join(str(value).split())
+        if key == 'q':
+            value = value.casefold()
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+
+def is_cacheable(search_results: Optional[Dict]) -> bool:
+    """Only successful searches are cached; API errors such as a bad key are not."""
+    if not search_results:
+        return False
+    return search_results.get('search_metadata', {}).get('status') == 'Success'
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """Returns the content address (SHA-256) of a set of search parameters."""
+    canonical = json.dumps(normalize_search_params(params), separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class SerpCache:
+    """
+    A SQLite-backed cache of SerpApi responses keyed on the normalized search
+    parameters, so debtors sharing a name and location share one paid search.
+
+    Each entry has its own expiry time. Debtor IDs are mapped to the entry
+    that answered their search. Entries are evicted when expired, and least
+    recently used entries are dropped when the cache grows past its entry
+    count or byte size limits.
+    """
+
+    def __init__(self, db_path: str = SERP_CACHE_DB_PATH, ttl_days: float = SERP_CACHE_TTL_DAYS,
+                 max_entries: int = SERP_CACHE_MAX_ENTRIES, max_bytes: int = SERP_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS SerpCache (
+            cache_key TEXT PRIMARY KEY,
+            params TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS DebtorSerpCache (
+            debtor_id INTEGER PRIMARY KEY,
+            cache_key TEXT NOT NULL
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_SerpCache_ExpiresAt ON SerpCache (expires_at)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_SerpCache_LastAccess ON SerpCache (last_access)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS IX_DebtorSerpCache_CacheKey ON DebtorSerpCache (cache_key)')
+        self.conn.commit()
+
+    def _get_by_key(self, cache_key: str) -> Optional[Dict]:
+        now = time.time()
+        row = self.conn.execute(
+            'SELECT payload FROM SerpCache WHERE cache_key = ? AND expires_at > ?',
+            (cache_key, now)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute('UPDATE SerpCache SET last_access = ? WHERE cache_key = ?', (now, cache_key))
+        self.conn.commit()
+        return json.loads(zlib.decompress(row[0]))
+
+    def get(self, params: Dict[str, Any]) -> Optional[Dict]:
+        """Returns the cached response for these search parameters, if still fresh."""
+        return self._get_by_key(make_cache_key(params))
+
+    def get_for_debtor(self, debtor_id: int) -> Optional[Dict]:
+        """Returns the cached response last linked to a debtor, if still fresh."""
+        row = self.conn.execute(
+            'SELECT cache_key FROM DebtorSerpCache WHERE debtor_id = ?', (debtor_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._get_by_key(row[0])
+
+    def put(self, params: Dict[str, Any], search_results: Dict, debtor_id: Optional[int] = None,
+            ttl_days: Optional[float] = None) -> str:
+        """
+        Stores a response under the key of its search parameters and returns the key.
+        When debtor_id is given, the debtor is linked to the entry.
+        """
+        cache_key = make_cache_key(params)
+        payload = zlib.compress(json.dumps(search_results, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_days is None else ttl_days * 86400
+
+        self.conn.execute(
+            'INSERT OR REPLACE INTO SerpCache '
+            '(cache_key, params, payload, size, created_at, expires_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (cache_key, json.dumps(normalize_search_params(params)), payload, len(payload),
+             now, now + ttl_seconds, now)
+        )
+        if debtor_id is not None:
+            self._link(debtor_id, cache_key)
+        self.conn.commit()
+        return cache_key
+
+    def _link(self, debtor_id: int, cache_key: str):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO DebtorSerpCache (debtor_id, cache_key) VALUES (?, ?)',
+            (debtor_id, cache_key)
+        )
+
+    def link(self, debtor_id: int, params: Dict[str, Any]) -> str:
+        """Links a debtor to the entry for these search parameters and returns its key."""
+        cache_key = make_cache_key(params)
+        self._link(debtor_id, cache_key)
+        self.conn.commit()
+        return cache_key
+
+    def evict(self, max_age_days: Optional[float] = None) -> int:
+        """
+        Removes expired entries, entries older than max_age_days, then least
+        recently used entries until the count and size limits are met.
+
+        Returns:
+            The number of entries removed.
+        """
+        now = time.time()
+        removed = self.conn.execute('DELETE FROM SerpCache WHERE expires_at <= ?', (now,)).rowcount
+        if max_age_days is not None:
+            removed += self.conn.execute(
+                'DELETE FROM SerpCache WHERE created_at <= ?', (now - max_age_days * 86400,)
+            ).rowcount
+
+        count, total_size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM SerpCache').fetchone()
+        if count > self.max_entries or total_size > self.max_bytes:
+            excess_count = max(0, count - self.max_entries)
+            excess_size = max(0, total_size - self.max_bytes)
+            to_delete = []
+            for cache_key, size in self.conn.execute('SELECT cache_key, size FROM SerpCache ORDER BY last_access'):
+                if excess_count <= 0 and excess_size <= 0:
+                    break
+                to_delete.append((cache_key,))
+                excess_count -= 1
+                excess_size -= size
+            self.conn.executemany('DELETE FROM SerpCache WHERE cache_key = ?', to_delete)
+            removed += len(to_delete)
+
+        self.conn.execute(
+            'DELETE FROM DebtorSerpCache WHERE cache_key NOT IN (SELECT cache_key FROM SerpCache)'
+        )
+        self.conn.commit()
+        if removed:
+            print(f"Evicted {removed} entries from the SERP cache.")
+        return removed
+
+    def close(self):
+        self.conn.close()
+
+
+_serp_cache: Optional[SerpCache] = None
+
+
+def get_serp_cache() -> SerpCache:
+    """Returns the process-wide SERP cache."""
+    global _serp_cache
+    if _serp_cache is None:
+        _serp_cache = SerpCache()
+    return _serp_cache
@@ -0,0 +1,123 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from extraction_profiles import ExtractionProfile, get_extraction_profile, get_profile_for_debtor
+from name_matching import build_name_index
+from phone_extractor import normalize_phone_number
+from serp_store import SerpStore, get_serp_store
+
+# Google's own business listings; scaled by how well the listing name matches the query
+KNOWLEDGE_GRAPH_CONFIDENCE = 0.95
+LOCAL_RESULTS_CONFIDENCE = 0.9
+DEFAULT_MIN_NAME_SCORE = 0.8
+
+_PERMANENTLY_CLOSED = re.compile(r'permanently closed|ferm[ée] d[ée]finitivement', re.IGNORECASE)
+_TEMPORARILY_CLOSED = re.compile(r'temporarily closed|ferm[ée] temporairement', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _clean(text: Any) -> str:
+    return _WHITESPACE.sub(' ', str(text)).strip(' ,;')
+
+
+def _closed_flags(block: Dict[str, Any]) -> Tuple[bool, bool]:
+    """Returns (permanently_closed, temporarily_closed) from the flags and hours text of a listing."""
+    hours_text = ' '.join(str(block.get(key) or '') for key in ('raw_hours', 'hours', 'open_state', 'type'))
+    permanently = bool(block.get('permanently_closed')) or bool(_PERMANENTLY_CLOSED.search(hours_text))
+    temporarily = bool(block.get('temporarily_closed')) or bool(_TEMPORARILY_CLOSED.search(hours_text))
+    return permanently, temporarily
+
+
+def _listing_feature(block: Dict[str, Any], source: str, base_confidence: float, name_score: float,
+                     profile: ExtractionProfile) -> Dict[str, Any]:
+    phone = normalize_phone_number(str(block['phone']), profile.phone_region) if block.get('phone') else None
+    website = block.get('website') or (block.get('links') or {}).get('website')
+    permanently_closed, temporarily_closed = _closed_flags(block)
+    return {
+        'source': source,
+        'title': block.get('title'),
+        'type': block.get('type'),
+        'name_score': name_score,
+        'confidence': round(base_confidence * name_score, 3),
+        'phones': {phone} if phone else set(),
+        'addresses': {_clean(block['address'])} if block.get('address') else set(),
+        'websites': {website} if website else set(),
+        'hours': block.get('hours') or block.get('raw_hours'),
+        'permanently_closed': permanently_closed,
+        'temporarily_closed': temporarily_closed,
+    }
+
+
+def _local_places(serp_api_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    local_results = serp_api_result.get('local_results')
+    if isinstance(local_results, dict):
+        local_results = local_results.get('places', [])
+    return [place for place in local_results or [] if isinstance(place, dict)]
+
+
+def extract_serp_features(serp_api_result: Dict[str, Any], profile: Optional[ExtractionProfile] = None,
+                          min_name_score: float = DEFAULT_MIN_NAME_SCORE) -> List[Dict[str, Any]]:
+    """
+    Reads the 'knowledge_graph' and 'local_results' blocks of a SERP API result.
+
+    Only listings whose title matches the query (fuzzy, accent-insensitive,
+    ignoring legal suffixes) are kept, so a map pack of competitors is not
+    taken for the debtor.
+
+    Returns:
+        One dict per matching listing with its source, title, name_score,
+        confidence, phones, addresses, websites, hours and closed flags.
+    """
+    profile = profile or get_extraction_profile()
+    query = serp_api_result.get('search_parameters', {}).get('q', '')
+    listings = []
+    knowledge_graph = serp_api_result.get('knowledge_graph')
+    if isinstance(knowledge_graph, dict) and knowledge_graph.get('title'):
+        listings.append(('knowledge_graph', KNOWLEDGE_GRAPH_CONFIDENCE, knowledge_graph))
+    listings.extend(('local_results', LOCAL_RESULTS_CONFIDENCE, place)
+                    for place in _local_places(serp_api_result) if place.get('title'))
+    if not listings:
+        return []
+
+    index = build_name_index((i, block['title']) for i, (_, _, block) in enumerate(listings))
+    return [
+        _listing_feature(listings[i][2], listings[i][0], listings[i][1], score, profile)
+        for i, score in sorted(index.rank(query, min_name_score))
+    ]
+
+
+def extract_serp_contacts(serp_api_result: Dict[str, Any], profile: Optional[ExtractionProfile] = None,
+                          min_name_score: float = DEFAULT_MIN_NAME_SCORE) -> Dict[str, Any]:
+    """
+    Merges the matching SERP listings into the contact schema of
+    `ContactExtractor.extract_all`, plus websites, hours, closed flags,
+    the listing sources and the highest listing confidence.
+    """
+    features = extract_serp_features(serp_api_result, profile, min_name_score)
+    contacts: Dict[str, Any] = {
+        'phones': set(), 'emails': set(), 'addresses': set(), 'websites': set(),
+        'hours': None, 'permanently_closed': False, 'temporarily_closed': False,
+        'sources': [], 'confidence': 0.0,
+    }
+    for feature in features:
+        for field in ('phones', 'addresses', 'websites'):
+            contacts[field] |= feature[field]
+        contacts['hours'] = contacts['hours'] or feature['hours']
+        contacts['permanently_closed'] |= feature['permanently_closed']
+        contacts['temporarily_closed'] |= feature['temporarily_closed']
+        contacts['sources'].append(feature['source'])
+        contacts['confidence'] = max(contacts['confidence'], feature['confidence'])
+    return contacts
+
+
+def iter_serp_archive_contacts(store: Optional[SerpStore] = None,
+                               debtor_ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yields (debtor_id, extract_serp_contacts(...)) for the searches of the
+    SERP store, each with the extraction profile of its debtor.
+    """
+    store = store or get_serp_store()
+    for debtor_id in (store.debtor_ids() if debtor_ids is None else debtor_ids):
+        serp_api_result = store.load(debtor_id)
+        if serp_api_result is not None:
+            yield debtor_id, extract_serp_contacts(serp_api_result, get_profile_for_debtor(debtor_id))
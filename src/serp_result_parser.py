@@ -1,28 +1,38 @@
-import os
 from typing import Set, Dict, Optional
-from config import SERP_PREVIOUS_SEARCHES_PATH
-from utils import find_input_files, load_json_file, select_relevant_sites
-from ContactExtractor import ContactExtractor
+from serp_store import get_serp_store
+from utils import select_relevant_sites
+from extraction_cache import get_extraction_cache
+from extraction_profiles import DEFAULT_COUNTRY_CODE, get_profile_for_debtor
+from serp_features import extract_serp_contacts
+from owner_extractor import extract_serp_owners, split_owner_candidates
+from operational_status import classify_operational_status
 
 get_organic_result_info = lambda x, i: x['organic_results'][i].get('title', '') + ' ' + x['organic_results'][i].get('snippet', '')
 get_organic_result_link = lambda x, i: x['organic_results'][i].get('link', '')
 
-def get_contact_info(search: Dict) -> Dict[str, Set[str]]:
-    full_text = ''
-    for position in search['relevant_sites']:
-        full_text += get_organic_result_info(search, position - 1) + ' '
-    return ContactExtractor(full_text).extract_all()
+def get_contact_info(search: Dict, country_code: str = DEFAULT_COUNTRY_CODE) -> Dict[str, Set[str]]:
+    chunks = [get_organic_result_info(search, position - 1) + ' ' for position in search['relevant_sites']]
+    return get_extraction_cache().extract_chunks(chunks, region=country_code)
 
 if __name__ == "__main__":
-    json_files = find_input_files(SERP_PREVIOUS_SEARCHES_PATH)
     searches: Dict = {}
+    # Checkouts from before the SERP store only have the per-debtor JSON files
+    get_serp_store().import_json_directory_if_empty()
 
-    for json_file in json_files:
-        file_name = os.path.basename(json_file).split('.')[0]
-        serp_data = load_json_file(json_file)
+    for debtor_id, serp_data in get_serp_store().iter_searches():
+        file_name = str(debtor_id)
         searches[file_name] = serp_data
         searches[file_name]['relevant_sites'] = select_relevant_sites(serp_data)
-        searches[file_name]['contact_info'] = get_contact_info(searches[file_name])
+        profile = get_profile_for_debtor(debtor_id)
+        searches[file_name]['contact_info'] = get_contact_info(searches[file_name], profile.country_code)
+        serp_payload = get_serp_store().load(debtor_id) or {}
+        searches[file_name]['serp_features'] = extract_serp_contacts(serp_payload, profile)
+        searches[file_name]['operational_status'] = classify_operational_status(
+            serp_payload, positions=searches[file_name]['relevant_sites']
+        )
+        searches[file_name]['owners'], searches[file_name]['uncertain_owners'] = split_owner_candidates(
+            extract_serp_owners(searches[file_name], searches[file_name]['relevant_sites'])
+        )
 
         searches[file_name]['relevant_links'] = []
         for position in searches[file_name]['relevant_sites']:
@@ -34,4 +44,13 @@ if __name__ == "__main__":
         print(f"   Search Query:: {search['search_parameters']['q']}")
         print(f"   Relevant Links ({len(search['relevant_links'])}): {search['relevant_links']}")
         print(f"   Contact Info: {search['contact_info']}")
-        print("-" * 50)
\ No newline at end of file
+        print(f"   SERP Features: {search['serp_features']}")
+        status = search['operational_status']
+        print(f"   Operational Status: {status.status} ({status.confidence:.0%})")
+        for signal in status.evidence:
+            print(f"      {signal.status} ({signal.weight}): {signal.detail}")
+        print(f"   Owners: {[(owner.name, owner.role, owner.confidence) for owner in search['owners']]}")
+        if search['uncertain_owners']:
+            print(f"   Uncertain Owners (for LLM review): {[owner.name for owner in search['uncertain_owners']]}")
+        print("-" * 50)
+    print(get_extraction_cache().stats)
\ No newline at end of file
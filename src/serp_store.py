@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config import SERP_STORE_DB_PATH, SERP_PREVIOUS_SEARCHES_PATH
+from utils import find_input_files, load_json_file
+
+ORGANIC_RESULT_COLUMNS = ('title', 'snippet', 'link', 'missing')
+# Debtor IDs bound per 'IN (...)' query, below the SQLite variable limit of older builds (999)
+MAX_IDS_PER_QUERY = 900
+
+
+def _id_chunks(debtor_ids: Iterable[int]) -> Iterator[List[int]]:
+    """Splits debtor IDs into sorted chunks of at most MAX_IDS_PER_QUERY, in increasing order."""
+    ids = sorted(set(debtor_ids))
+    for start in range(0, len(ids), MAX_IDS_PER_QUERY):
+        yield ids[start:start + MAX_IDS_PER_QUERY]
+
+
+class SerpStore:
+    """
+    A single SQLite file holding every saved SerpApi response.
+
+    The raw response is kept as a compressed blob in 'SerpSearches', and the
+    organic result fields used by the parsers are stored as columns of
+    'OrganicResults', so they can be read without decoding any JSON.
+    """
+
+    def __init__(self, db_path: str = SERP_STORE_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Searches are saved from worker threads by the batch fetcher
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS SerpSearches (
+            debtor_id INTEGER PRIMARY KEY,
+            query TEXT,
+            fetched_at REAL NOT NULL,
+            payload BLOB NOT NULL
+        )
+        ''')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS OrganicResults (
+            debtor_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            title TEXT,
+            snippet TEXT,
+            link TEXT,
+            missing TEXT,
+            PRIMARY KEY (debtor_id, position)
+        ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def _organic_rows(debtor_id: int, search_results: Dict) -> List[Tuple]:
+        rows = []
+        for item in search_results.get('organic_results', []):
+            position = item.get('position')
+            if not position:
+                continue
+            missing = item.get('missing')
+            rows.append((
+                debtor_id,
+                position,
+                item.get('title', ''),
+                item.get('snippet', ''),
+                item.get('link', ''),
+                json.dumps(missing, ensure_ascii=False) if missing else None,
+            ))
+        return rows
+
+    def _save(self, debtor_id: int, search_results: Dict, fetched_at: float):
+        query = search_results.get('search_parameters', {}).get('q')
+        payload = zlib.compress(json.dumps(search_results, ensure_ascii=False).encode('utf-8'))
+        self.conn.execute(
+            'INSERT OR REPLACE INTO SerpSearches (debtor_id, query, fetched_at, payload) VALUES (?, ?, ?, ?)',
+            (debtor_id, query, fetched_at, payload)
+        )
+        self.conn.execute('DELETE FROM OrganicResults WHERE debtor_id = ?', (debtor_id,))
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO OrganicResults (debtor_id, position, title, snippet, link, missing) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            self._organic_rows(debtor_id, search_results)
+        )
+
+    def save(self, debtor_id: int, search_results: Dict):
+        """Stores (or replaces) the search results of a debtor."""
+        with self._lock:
+            self._save(debtor_id, search_results, time.time())
+            self.conn.commit()
+
+    def load(self, debtor_id: int) -> Optional[Dict]:
+        """Returns the full raw search results of a debtor, if stored."""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT payload FROM SerpSearches WHERE debtor_id = ?', (debtor_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def debtor_ids(self) -> List[int]:
+        """Returns the IDs of all debtors with stored search results."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute('SELECT debtor_id FROM SerpSearches ORDER BY debtor_id')]
+
+    def iter_organic_results(self, columns: Sequence[str] = ('title', 'snippet'),
+                             debtor_ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[Any, ...]]:
+        """
+        Yields (debtor_id, position, *columns) for the stored organic results,
+        ordered by debtor and position. Only the requested columns are read.
+
+        Args:
+            columns: Any of 'title', 'snippet', 'link' and 'missing'.
+            debtor_ids: Restricts the results to these debtors.
+        """
+        unknown = set(columns) - set(ORGANIC_RESULT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown organic result columns: {sorted(unknown)}")
+
+        select_columns = ', '.join(('debtor_id', 'position') + tuple(columns))
+        sql = f'SELECT {select_columns} FROM OrganicResults'
+        if debtor_ids is None:
+            queries = [(f'{sql} ORDER BY debtor_id, position', ())]
+        else:
+            queries = [
+                (f"{sql} WHERE debtor_id IN ({', '.join('?' * len(ids))}) ORDER BY debtor_id, position", tuple(ids))
+                for ids in _id_chunks(debtor_ids)
+            ]
+
+        missing_index = 2 + list(columns).index('missing') if 'missing' in columns else None
+        for query, params in queries:
+            with self._lock:
+                rows = self.conn.execute(query, params).fetchall()
+            for row in rows:
+                if missing_index is not None and row[missing_index] is not None:
+                    row = row[:missing_index] + (json.loads(row[missing_index]),) + row[missing_index + 1:]
+                yield row
+
+    def iter_searches(self, debtor_ids: Optional[Iterable[int]] = None) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yields (debtor_id, search) where search has the shape of a SerpApi
+        response restricted to the query and the organic result columns.
+        The raw payloads are not decoded.
+        """
+        ids = None if debtor_ids is None else list(debtor_ids)
+        sql = 'SELECT debtor_id, query FROM SerpSearches'
+        if ids is None:
+            queries = [(sql, ())]
+        else:
+            queries = [(f"{sql} WHERE debtor_id IN ({', '.join('?' * len(chunk))})", tuple(chunk))
+                       for chunk in _id_chunks(ids)]
+        searches = {}
+        for query, params in queries:
+            with self._lock:
+                searches.update(
+                    (debtor_id, {'search_parameters': {'q': query_text or ''}, 'organic_results': []})
+                    for debtor_id, query_text in self.conn.execute(query, params)
+                )
+
+        for debtor_id, position, title, snippet, link, missing in self.iter_organic_results(ORGANIC_RESULT_COLUMNS, ids):
+            item = {'position': position, 'title': title, 'snippet': snippet, 'link': link}
+            if missing:
+                item['missing'] = missing
+            searches[debtor_id]['organic_results'].append(item)
+
+        for debtor_id in sorted(searches):
+            yield debtor_id, searches[debtor_id]
+
+    def import_json_directory(self, directory: str = SERP_PREVIOUS_SEARCHES_PATH) -> int:
+        """
+        Imports the per-debtor JSON files written by earlier versions.
+
+        Returns:
+            The number of searches imported.
+        """
+        imported = 0
+        with self._lock:
+            for json_file in find_input_files(directory, 'json'):
+                file_name = os.path.basename(json_file).split('.')[0]
+                search_results = load_json_file(json_file)
+                if not file_name.isdigit() or search_results is None:
+                    print(f"Warning: Could not load or parse file {file_name}.")
+                    continue
+                self._save(int(file_name), search_results, os.path.getmtime(json_file))
+                imported += 1
+            self.conn.commit()
+        print(f"Imported {imported} searches into {self.db_path}.")
+        return imported
+
+    def import_json_directory_if_empty(self, directory: str = SERP_PREVIOUS_SEARCHES_PATH) -> int:
+        """
+        Imports the per-debtor JSON files into a store that has no search yet,
+        e.g. on a checkout that only has the JSON archive of earlier versions.
+
+        Returns:
+            The number of searches imported.
+        """
+        with self._lock:
+            has_searches = self.conn.execute('SELECT 1 FROM SerpSearches LIMIT 1').fetchone() is not None
+        if has_searches or not os.path.isdir(directory):
+            return 0
+        return self.import_json_directory(directory)
+
+    def close(self):
+        self.conn.close()
+
+
+_serp_store: Optional[SerpStore] = None
+_serp_store_lock = threading.Lock()
+
+
+def get_serp_store() -> SerpStore:
+    """Returns the process-wide SERP store; safe to call from worker threads."""
+    global _serp_store
+    if _serp_store is None:
+        with _serp_store_lock:
+            if _serp_store is None:
+                _serp_store = SerpStore()
+    return _serp_store
+
+
+if __name__ == "__main__":
+    get_serp_store().import_json_directory()
@@ -0,0 +1,293 @@
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import unquote
+
+from ContactExtractor import ContactExtractor, iter_email_spans
+from address_extractor import normalize_province
+from extraction_profiles import ExtractionProfile, get_extraction_profile
+from phone_extractor import normalize_phone_number
+
+CONTACT_FIELDS = ('phones', 'emails', 'addresses')
+
+# schema.org types whose contact properties describe the business itself
+ORGANIZATION_TYPES = {
+    'Organization', 'Corporation', 'LocalBusiness', 'ProfessionalService', 'HomeAndConstructionBusiness',
+    'GeneralContractor', 'Electrician', 'Plumber', 'HousePainter', 'RoofingContractor', 'HVACBusiness',
+    'Locksmith', 'MovingCompany', 'AutomotiveBusiness', 'AutoRepair', 'FoodEstablishment', 'Restaurant',
+    'Store', 'LegalService', 'Attorney', 'Notary', 'FinancialService', 'AccountingService', 'Dentist',
+    'MedicalBusiness', 'RealEstateAgent', 'LodgingBusiness', 'HealthAndBeautyBusiness', 'EmploymentAgency',
+    'TravelAgency', 'SportsActivityLocation', 'EntertainmentBusiness', 'EducationalOrganization', 'NGO',
+}
+# Subtypes not listed above ('CleaningService', 'ShoeStore', ...) are recognized by their suffix
+ORGANIZATION_TYPE_SUFFIXES = ('Business', 'Service', 'Contractor', 'Store', 'Agency')
+
+_CONTACT_HREF = re.compile(r'''href\s*=\s*["']\s*(tel|mailto|callto):([^"'#]+)''', re.IGNORECASE)
+_JSON_LD_SCRIPT = re.compile(
+    r'''<script[^>]*type\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script>''',
+    re.IGNORECASE | re.DOTALL
+)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _field(crawl_result: Any, name: str, default=None):
+    """Reads a field of a crawl4ai CrawlResult, or of its JSON form from the REST API."""
+    if isinstance(crawl_result, dict):
+        return crawl_result.get(name, default)
+    return getattr(crawl_result, name, default)
+
+
+def get_markdown(crawl_result: Any) -> str:
+    """Returns the raw markdown of a crawl result, whatever its crawl4ai version."""
+    markdown = _field(crawl_result, 'markdown')
+    if markdown is None:
+        return ''
+    if isinstance(markdown, str):
+        return markdown
+    if isinstance(markdown, dict):
+        return markdown.get('raw_markdown') or ''
+    return getattr(markdown, 'raw_markdown', '') or ''
+
+
+def _clean(text: Any) -> str:
+    return _WHITESPACE.sub(' ', str(text)).strip(' ,;')
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _is_organization(node: Dict[str, Any]) -> bool:
+    for node_type in _as_list(node.get('@type')):
+        node_type = str(node_type).rsplit('/', 1)[-1]
+        if node_type in ORGANIZATION_TYPES or node_type.endswith(ORGANIZATION_TYPE_SUFFIXES):
+            return True
+    return False
+
+
+def format_postal_address(street: Any = None, city: Any = None, region: Any = None,
+                          postal_code: Any = None) -> Optional[str]:
+    """Formats the parts of a schema.org PostalAddress as '8245 rue Fanny, Laval, QC H7A 1A6'."""
+    if region:
+        region = normalize_province(str(region)) or _clean(region)
+    last_part = ' '.join(_clean(part) for part in (region, postal_code) if part)
+    parts = [_clean(part) for part in (street, city) if part] + ([last_part] if last_part else [])
+    if not street or len(parts) < 2:
+        return None
+    return ', '.join(parts)
+
+
+class _Contacts:
+    """Accumulates structured findings, normalized with the rules of a profile."""
+
+    def __init__(self, profile: ExtractionProfile):
+        self.profile = profile
+        self.found: Dict[str, Set[str]] = {field: set() for field in CONTACT_FIELDS}
+
+    def add_phone(self, raw_number: Any):
+        phone = normalize_phone_number(unquote(str(raw_number)).strip(), self.profile.phone_region)
+        if phone:
+            self.found['phones'].add(phone)
+
+    def add_email(self, raw_email: Any):
+        address = unquote(str(raw_email)).split('?', 1)[0].strip()
+        if address.lower().startswith('mailto:'):
+            address = address[len('mailto:'):]
+        for _, _, email in iter_email_spans(address):
+            self.found['emails'].add(email)
+
+    def add_address(self, address: Any):
+        if isinstance(address, dict):
+            address = format_postal_address(
+                address.get('streetAddress'), address.get('addressLocality'),
+                address.get('addressRegion'), address.get('postalCode'),
+            )
+        elif address:
+            address = _clean(address)
+        if address:
+            self.found['addresses'].add(address)
+
+
+def _iter_json_ld_nodes(data: Any) -> Iterator[Dict[str, Any]]:
+    """Walks every object of a JSON-LD document, including @graph members and nested objects."""
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for value in data.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_json_ld_nodes(value)
+
+
+def _add_json_ld(contacts: _Contacts, html: str):
+    for script in _JSON_LD_SCRIPT.findall(html):
+        try:
+            data = json.loads(script.strip(), strict=False)
+        except ValueError:
+            continue
+        for node in _iter_json_ld_nodes(data):
+            if not _is_organization(node):
+                continue
+            for contact_node in [node] + [point for point in _as_list(node.get('contactPoint'))
+                                          if isinstance(point, dict)]:
+                for phone in _as_list(contact_node.get('telephone')):
+                    contacts.add_phone(phone)
+                for email in _as_list(contact_node.get('email')):
+                    contacts.add_email(email)
+            for address in _as_list(node.get('address')):
+                contacts.add_address(address)
+
+
+class _MicrodataParser(HTMLParser):
+    """Collects the telephone, email and PostalAddress itemprops of an HTML page."""
+
+    VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'}
+    ADDRESS_PROPS = {'streetAddress', 'addressLocality', 'addressRegion', 'postalCode'}
+
+    def __init__(self, contacts: _Contacts):
+        super().__init__(convert_charrefs=True)
+        self.contacts = contacts
+        # One entry per open element: (tag, itemprop being captured or None, opened address scope or None)
+        self._stack: List[tuple] = []
+        self._captures: Dict[int, List[str]] = {}
+        self._address_scopes: List[Dict[str, str]] = []
+
+    def _set_prop(self, prop: str, value: str):
+        value = _clean(value)
+        if not value:
+            return
+        if prop == 'telephone':
+            self.contacts.add_phone(value)
+        elif prop == 'email':
+            self.contacts.add_email(value)
+        elif prop in self.ADDRESS_PROPS and self._address_scopes:
+            self._address_scopes[-1].setdefault(prop, value)
+        elif prop == 'address' and not self._address_scopes:
+            self.contacts.add_address(value)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        props = (attrs.get('itemprop') or '').split()
+        direct_value = attrs.get('content') or (attrs.get('href') if tag in ('a', 'link') else None)
+
+        address_scope = None
+        if 'itemscope' in attrs and 'PostalAddress' in (attrs.get('itemtype') or ''):
+            address_scope = {}
+            self._address_scopes.append(address_scope)
+
+        captured_prop = None
+        for prop in props:
+            if direct_value is not None and prop != 'address':
+                self._set_prop(prop, direct_value)
+            elif prop in self.ADDRESS_PROPS or prop in ('telephone', 'email') or (
+                    prop == 'address' and address_scope is None):
+                captured_prop = prop
+
+        if tag in self.VOID_ELEMENTS:
+            if address_scope is not None:
+                self._close_address_scope()
+            return
+        self._stack.append((tag, captured_prop, address_scope))
+        if captured_prop:
+            self._captures[len(self._stack) - 1] = []
+
+    def handle_data(self, data):
+        for parts in self._captures.values():
+            parts.append(data)
+
+    def _close_address_scope(self):
+        scope = self._address_scopes.pop()
+        self.contacts.add_address({
+            'streetAddress': scope.get('streetAddress'),
+            'addressLocality': scope.get('addressLocality'),
+            'addressRegion': scope.get('addressRegion'),
+            'postalCode': scope.get('postalCode'),
+        })
+
+    def handle_endtag(self, tag):
+        # Closes every element up to the matching open tag, tolerating unclosed elements
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > index:
+            _, captured_prop, address_scope = self._stack.pop()
+            parts = self._captures.pop(len(self._stack), None)
+            if captured_prop and parts is not None:
+                self._set_prop(captured_prop, ''.join(parts))
+            if address_scope is not None:
+                self._close_address_scope()
+
+
+def _iter_link_hrefs(crawl_result: Any) -> Iterable[str]:
+    links = _field(crawl_result, 'links') or {}
+    for group in ('internal', 'external'):
+        for link in links.get(group, []) or []:
+            href = link.get('href') if isinstance(link, dict) else link
+            if href:
+                yield href
+
+
+def extract_structured_contacts(crawl_result: Any, profile: Optional[ExtractionProfile] = None) -> Dict[str, Set[str]]:
+    """
+    Harvests the exact contact data of a crawl result: 'tel:' and 'mailto:'
+    links, schema.org Organization/LocalBusiness JSON-LD, and microdata.
+
+    Args:
+        crawl_result: A crawl4ai CrawlResult, or its JSON form from the REST API.
+        profile: The country profile used to normalize phone numbers.
+
+    Returns:
+        The same keys as `ContactExtractor.extract_all`.
+    """
+    contacts = _Contacts(profile or get_extraction_profile())
+    html = _field(crawl_result, 'html') or ''
+
+    hrefs = list(_iter_link_hrefs(crawl_result))
+    hrefs += [f'{scheme}:{target}' for scheme, target in _CONTACT_HREF.findall(html)]
+    for href in hrefs:
+        scheme, _, target = href.strip().partition(':')
+        scheme = scheme.lower()
+        if scheme in ('tel', 'callto'):
+            contacts.add_phone(target)
+        elif scheme == 'mailto':
+            contacts.add_email(target)
+
+    if 'ld+json' in html:
+        _add_json_ld(contacts, html)
+    if 'itemprop' in html:
+        parser = _MicrodataParser(contacts)
+        parser.feed(html)
+        parser.close()
+    return contacts.found
+
+
+def extract_crawl_contacts(crawl_result: Any, profile: Optional[ExtractionProfile] = None) -> Dict[str, Set[str]]:
+    """
+    Extracts the contact information of a crawl result, structured sources first.
+
+    The markdown is scanned only when a contact field is still empty after
+    the structured sources, and its findings only fill the empty fields.
+    """
+    profile = profile or get_extraction_profile()
+    contacts = extract_structured_contacts(crawl_result, profile)
+    missing = [field for field in CONTACT_FIELDS if not contacts[field]]
+    if not missing:
+        return contacts
+
+    markdown = get_markdown(crawl_result)
+    if markdown:
+        extractor = ContactExtractor(markdown, profile)
+        extractors = {
+            'phones': extractor.extract_phone_numbers,
+            'emails': extractor.extract_emails,
+            'addresses': extractor.extract_addresses,
+        }
+        for field in missing:
+            contacts[field] = set(extractors[field]())
+    return contacts
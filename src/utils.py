@@ -2,8 +2,13 @@ import re
 import os
 import json
 import glob
-from typing import Dict, List, Set, Optional, Any
-from urllib.parse import urlparse
+import random
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, List, Set, Optional, Any, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+from name_matching import build_name_index, is_legal_suffix
 
 
 COMPANY_STOP_WORDS = {'inc', 'ltd', 'llc', 'corp', 'co', 'group'}
@@ -11,6 +16,20 @@ SOCIAL_MEDIA_DOMAINS = {
     "facebook.com", "twitter.com", "x.com", "linkedin.com", "instagram.com",
     "pinterest.com", "tiktok.com", "snapchat.com", "reddit.com",
 }
+# Public suffixes of two labels; every other domain is registered directly under its TLD
+MULTI_LABEL_SUFFIXES = {
+    'qc.ca', 'on.ca', 'bc.ca', 'ab.ca', 'mb.ca', 'sk.ca', 'ns.ca', 'nb.ca', 'nl.ca', 'pe.ca', 'yt.ca',
+    'nt.ca', 'nu.ca', 'gc.ca', 'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au',
+    'co.nz', 'com.br', 'com.mx', 'co.jp', 'com.cn', 'co.in', 'com.fr',
+}
+# Query parameters that track a visit without changing the page
+TRACKING_PARAMS = {
+    'gclid', 'gclsrc', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'srsltid', 'ref', 'ref_src', 'si', 'spm',
+}
+TRACKING_PARAM_PREFIXES = ('utm_', 'hsa_', 'pk_', 'mtm_')
+_DEFAULT_PORTS = {80, 443}
+_INDEX_PAGE = re.compile(r'/(?:index|default)\.(?:html?|php|aspx?)$', re.IGNORECASE)
 
 
 def find_input_files(input_directory, file_extension: str = None) -> List[str]:
@@ -52,6 +71,88 @@ def load_json_file(file_path: str) -> Optional[Dict]:
     except (json.JSONDecodeError, IOError) as e:
         return None
 
+
+def iter_file_chunks(file_path: str, block_size: int = 65536) -> Iterator[str]:
+    """Reads a text file in blocks of block_size characters."""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        while block := f.read(block_size):
+            yield block
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Returns the delay in seconds of a Retry-After value, given in seconds or as an HTTP date."""
+    if not retry_after:
+        return None
+    retry_after = retry_after.strip()
+    if retry_after.isdigit():
+        return float(retry_after)
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_delay(response) -> Optional[float]:
+    """Returns the delay in seconds requested by the Retry-After header of an HTTP response, if any."""
+    return parse_retry_after(response.headers.get('Retry-After'))
+
+
+@lru_cache(maxsize=65536)
+def registrable_domain(url_or_host: str) -> str:
+    """
+    Returns the registrable domain of a URL or host name, the part a site
+    owner registers: 'https://www.pagesjaunes.ca/bus/...' -> 'pagesjaunes.ca',
+    'm.facebook.com' -> 'facebook.com', 'ville.laval.qc.ca' -> 'laval.qc.ca'.
+    Only the multi-label public suffixes of MULTI_LABEL_SUFFIXES are known.
+    """
+    host = urlparse(url_or_host).hostname if '//' in url_or_host else url_or_host
+    host = (host or '').lower().rstrip('.')
+    labels = host.split('.')
+    if len(labels) <= 2 or host.replace('.', '').isdigit():
+        return host
+    suffix_length = 2 if '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 1
+    return '.'.join(labels[-(suffix_length + 1):])
+
+
+@lru_cache(maxsize=65536)
+def canonicalize_url(url: str) -> str:
+    """
+    Returns the canonical form of a web URL, shared by the URLs that lead to
+    the same page: https scheme, lowercase host without 'www.' or default
+    port, no fragment, no tracking parameters (TRACKING_PARAMS, utm_*...)
+    and the other parameters sorted, no duplicate or trailing slashes and
+    no index page. 'http://www.Example.com/contact/?utm_source=x#map'
+    -> 'https://example.com/contact'.
+    URLs that are not web URLs are only stripped.
+    """
+    url = url.strip()
+    parsed = urlsplit(url)
+    if parsed.scheme.lower() not in ('http', 'https') or not parsed.hostname:
+        return url
+    host = parsed.hostname.rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port not in _DEFAULT_PORTS:
+        host = f'{host}:{port}'
+
+    path = _INDEX_PAGE.sub('/', re.sub(r'/{2,}', '/', parsed.path))
+    path = path.rstrip('/') or '/'
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return urlunsplit(('https', host, path, urlencode(params), ''))
+
+
 def deduplicate_social_media_urls(url_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Filters a list to keep only the best URL per social media domain."""
     social_media_groups: Dict[str, List[Dict[str, Any]]] = {}
@@ -72,6 +173,15 @@ def deduplicate_social_media_urls(url_list: List[Dict[str, Any]]) -> List[Dict[s
     return final_list
 
 
+@lru_cache(maxsize=65536)
+def get_query_keywords(query: str) -> FrozenSet[str]:
+    """Returns the keywords of a search query: lowercase words without punctuation or company stop words."""
+    if not query:
+        return frozenset()
+    name = re.sub(r'[^\w\s]', '', query.lower())
+    return frozenset(word for word in name.split() if word not in COMPANY_STOP_WORDS and not is_legal_suffix(word))
+
+
 def _are_all_keywords_present(text_to_check: str, keywords: Set[str]) -> bool:
     if not keywords:
         return False
@@ -82,27 +192,50 @@ def _are_all_keywords_present(text_to_check: str, keywords: Set[str]) -> bool:
 def _is_missing_check_ok(missing_list: Optional[List[str]]) -> bool:
     if not missing_list:
         return True
-    return all(word.lower() in COMPANY_STOP_WORDS for word in missing_list)
+    return all(word.lower() in COMPANY_STOP_WORDS or is_legal_suffix(word) for word in missing_list)
 
 
-def select_relevant_sites(serp_api_result: Dict[str, Any]) -> List[int]:
+def rank_relevant_sites(serp_api_result: Dict[str, Any], min_score: float = 0.8) -> List[Tuple[int, float]]:
+    """
+    Ranks the 'organic_results' of a SERP API result by fuzzy, accent-insensitive
+    similarity between their titles and the query, ignoring legal suffixes.
+
+    Args:
+        serp_api_result: The full JSON dictionary from a SERP API search.
+        min_score: The minimum token-set similarity, between 0 and 1.
+
+    Returns:
+        (position, score) pairs of the results scoring at least min_score, best first.
+    """
+    query = serp_api_result.get("search_parameters", {}).get("q", "")
+    items = {
+        item['position']: item for item in serp_api_result.get("organic_results", [])
+        if item.get("link") and item.get("position") and _is_missing_check_ok(item.get('missing'))
+    }
+    index = build_name_index((position, item.get('title', '')) for position, item in items.items())
+    return index.rank(query, min_score)
+
+
+def select_relevant_sites(serp_api_result: Dict[str, Any], min_score: Optional[float] = None) -> List[int]:
     """
     Selects relevant site positions from the 'organic_results' of a SERP API result.
 
     Args:
         serp_api_result: The full JSON dictionary from a SERP API search.
+        min_score: When given, results are matched with `rank_relevant_sites`
+            and returned best first, instead of requiring every query keyword
+            to appear in the title.
 
     Returns:
         A list of integer positions of the relevant and deduplicated organic results.
     """
+    if min_score is not None:
+        return [position for position, _ in rank_relevant_sites(serp_api_result, min_score)]
+
     relevant_items: List[Dict[str, Any]] = []
-    keywords = set()
 
     query = serp_api_result.get("search_parameters", {}).get("q", "")
-
-    if query:
-        name = re.sub(r'[^\w\s]', '', query.lower())
-        keywords = {word for word in name.split() if word not in COMPANY_STOP_WORDS}
+    keywords = get_query_keywords(query)
 
     # 1. Find all organic result items that match the strict criteria
     for item in serp_api_result.get("organic_results", []):
@@ -0,0 +1,25 @@
+import pytest
+
+from address_extractor import parse_addresses
+
+
+@pytest.mark.parametrize('text, street, city, postal_code', [
+    ('2500 boul. Laurier, Québec (Québec) G1V 2L1', 'boul. Laurier', 'Québec', 'G1V 2L1'),
+    ('2500 boul. Laurier, Québec, Québec G1V 2L1', 'boul. Laurier', 'Québec', 'G1V 2L1'),
+    ('1 rue des Carrières, Québec, QC G1R 4P5', 'rue des Carrières', 'Québec', 'G1R 4P5'),
+    ('900 boul. René-Lévesque Est, Québec, QC G1R 2B5', 'boul. René-Lévesque Est', 'Québec', 'G1R 2B5'),
+])
+def test_quebec_city_addresses(text, street, city, postal_code):
+    [address] = parse_addresses(text)
+    assert address.full_address == text
+    assert (address.street, address.city, address.province, address.postal_code) == (street, city, 'QC', postal_code)
+
+
+def test_province_in_parentheses_without_postal_code():
+    [address] = parse_addresses('8245 rue Fanny, Laval (Québec)')
+    assert (address.street, address.city, address.province, address.postal_code) == ('rue Fanny', 'Laval', 'QC', None)
+
+
+def test_province_anchor_does_not_clip_next_address():
+    addresses = parse_addresses('8245 rue Fanny, Laval (Québec). Aussi 12 rue Hôtel-de-Ville, Québec (Québec) G1R 4S7')
+    assert [(address.city, address.postal_code) for address in addresses] == [('Laval', None), ('Québec', 'G1R 4S7')]